@@ -0,0 +1,152 @@
+import numpy as np
+
+
+def _valid_rows(codes, values = None, weights = None):
+    valid = codes >= 0
+    if values is not None:
+        valid &= ~np.isnan(values)
+    if weights is not None:
+        valid &= ~np.isnan(weights) & (weights > 0)
+    return valid
+
+
+def group_sums(codes, n_groups, values, weights = None):
+    """Weighted totals of `values` and the matching weight sums per group code; NaNs are skipped.
+
+    Both are additive, so sums over disjoint row sets (e.g. survey years) add up to the
+    sums over their union.
+    """
+    values = np.asarray(values, dtype = float)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype = float)
+    valid = _valid_rows(codes, values, weights)
+    totals = np.bincount(codes[valid], weights = weights[valid] * values[valid], minlength = n_groups)
+    weight_sums = np.bincount(codes[valid], weights = weights[valid], minlength = n_groups)
+    return totals, weight_sums
+
+
+def group_quantiles(codes, n_groups, values, qs, weights = None):
+    """Quantiles `qs` of `values` per group code, as an (n_groups, len(qs)) array.
+
+    Sample positions are (S_k - w_k) / (S_n - w_n), with S the cumulative weight
+    within the group, and quantiles interpolate linearly between them. With equal
+    weights this is numpy's default 'linear' method (and plotly's box quartiles).
+    """
+    qs = np.atleast_1d(np.asarray(qs, dtype = float))
+    values = np.asarray(values, dtype = float)
+    weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype = float)
+    valid = _valid_rows(codes, values, weights)
+    codes, values, weights = codes[valid], values[valid], weights[valid]
+
+    order = np.lexsort((values, codes))
+    codes, values, weights = codes[order], values[order], weights[order]
+
+    counts = np.bincount(codes, minlength = n_groups)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    result = np.full((n_groups, len(qs)), np.nan)
+    if not len(values):
+        return result
+
+    cumulative = np.cumsum(weights)
+    before = np.concatenate([[0.0], cumulative])[starts]
+    within = cumulative - before[codes]
+    last = np.maximum(ends - 1, 0)
+    spans = within[last] - weights[last]
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        positions = np.nan_to_num((within - weights) / spans[codes])
+
+    # Positions are 0..1 within each group, so offsetting by 2 * code keeps one sorted key for every group.
+    keys = codes * 2.0 + positions
+    targets = np.arange(n_groups)[:, None] * 2.0 + qs[None, :]
+    hi = np.clip(np.searchsorted(keys, targets, side = 'right'), (starts + 1)[:, None], last[:, None])
+    lo = np.maximum(hi - 1, 0)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        frac = np.nan_to_num(np.clip((targets - keys[lo]) / (keys[hi] - keys[lo]), 0, 1))
+    interpolated = values[lo] + frac * (values[hi] - values[lo])
+
+    result[counts > 1] = interpolated[counts > 1]
+    result[counts == 1] = values[starts[counts == 1]][:, None]
+    return result
+
+
+def box_stats(codes, n_groups, values, weights = None):
+    """Box plot statistics per group code, using plotly's 1.5 * IQR whisker rule.
+
+    Returns a dict of per-group arrays (q1, median, q3, lowerfence, upperfence) and
+    'outliers', a list holding each group's values beyond the whiskers.
+    """
+    values = np.asarray(values, dtype = float)
+    weights = None if weights is None else np.asarray(weights, dtype = float)
+    q1, median, q3 = group_quantiles(codes, n_groups, values, [0.25, 0.5, 0.75], weights).T
+
+    # Rows left out of the weighted quartiles (missing or zero weight) are not drawn as whiskers or outliers either.
+    valid = _valid_rows(codes, values, weights)
+    codes, values = codes[valid], values[valid]
+    iqr = q3 - q1
+    low, high = (q1 - 1.5 * iqr)[codes], (q3 + 1.5 * iqr)[codes]
+    inside = (values >= low) & (values <= high)
+
+    lowerfence = np.full(n_groups, np.inf)
+    upperfence = np.full(n_groups, -np.inf)
+    np.minimum.at(lowerfence, codes[inside], values[inside])
+    np.maximum.at(upperfence, codes[inside], values[inside])
+
+    outside = ~inside
+    outlier_codes, outlier_values = codes[outside], values[outside]
+    order = np.argsort(outlier_codes, kind = 'stable')
+    outliers = np.split(outlier_values[order], np.cumsum(np.bincount(outlier_codes, minlength = n_groups))[:-1])
+
+    return {
+        'q1':q1,
+        'median':median,
+        'q3':q3,
+        'lowerfence':np.where(np.isfinite(lowerfence), lowerfence, np.nan),
+        'upperfence':np.where(np.isfinite(upperfence), upperfence, np.nan),
+        'outliers':outliers
+    }
+
+
+def group_ols(codes, n_groups, x, y):
+    """Least-squares fit of y = slope * x + intercept per group code, from bincount sums.
+
+    Returns a dict of per-group arrays: slope, intercept, r2 and n.
+    """
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    valid = _valid_rows(codes, x) & ~np.isnan(y)
+    codes, x, y = codes[valid], x[valid], y[valid]
+
+    def sums(weights = None):
+        return np.bincount(codes, weights = weights, minlength = n_groups)
+
+    n = sums()
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        mean_x, mean_y = sums(x) / n, sums(y) / n
+        dx, dy = x - mean_x[codes], y - mean_y[codes]
+        sxx, syy, sxy = sums(dx * dx), sums(dy * dy), sums(dx * dy)
+        slope = sxy / sxx
+        return {
+            'slope':slope,
+            'intercept':mean_y - slope * mean_x,
+            'r2':sxy * sxy / (sxx * syy),
+            'n':n
+        }
+
+
+def stratified_sample(codes, budget, seed = 0):
+    """Row positions of a random sample of about `budget` rows, allocated to each code in proportion to its size.
+
+    Sampling uniformly within each stratum keeps the shape of the point cloud while
+    capping how many points are drawn. Rows with a missing code are never sampled.
+    """
+    rows = np.flatnonzero(codes >= 0)
+    if budget is None or budget >= len(rows):
+        return rows
+    counts = np.bincount(codes[rows])
+    quotas = np.round(counts * budget / len(rows)).astype(np.intp)
+
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(rows)), codes[rows]))
+    starts = np.cumsum(counts) - counts
+    rank = np.arange(len(rows)) - np.repeat(starts, counts)
+    return np.sort(rows[order][rank < np.repeat(quotas, counts)])
@@ -1,223 +1,31 @@
-import numpy as np
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-import plotly.graph_objects as go
-import plotly.figure_factory as ff
 import dash
-import textwrap
-from jupyter_dash import JupyterDash
+import flask
+import os
 from dash import dcc
 from dash import html
-from dash.dependencies import Input, Output
-
-
-## Data cleaning and setup...
-gss = pd.read_csv("https://github.com/jkropko/DS-6001/raw/master/localdata/gss2018.csv",
-                 encoding='cp1252', na_values=['IAP','IAP,DK,NA,uncodeable', 'NOT SURE',
-                                               'DK', 'IAP, DK, NA, uncodeable', '.a', "CAN'T CHOOSE"])
-
-mycols = ['id', 'wtss', 'sex', 'educ', 'region', 'age', 'coninc',
-          'prestg10', 'mapres10', 'papres10', 'sei10', 'satjob',
-          'fechld', 'fefam', 'fepol', 'fepresch', 'meovrwrk'] 
-
-gss_clean = gss[mycols]
-
-gss_clean = gss_clean.rename({'wtss':'weight', 
-                              'educ':'education', 
-                              'coninc':'income', 
-                              'prestg10':'job_prestige',
-                              'mapres10':'mother_job_prestige', 
-                              'papres10':'father_job_prestige', 
-                              'sei10':'socioeconomic_index', 
-                              'fechld':'relationship', 
-                              'fefam':'male_breadwinner', 
-                              'fehire':'hire_women', 
-                              'fejobaff':'preference_hire_women', 
-                              'fepol':'men_bettersuited', 
-                              'fepresch':'child_suffer',
-                              'meovrwrk':'men_overwork'},axis=1)
-
-gss_clean.age = gss_clean.age.replace({'89 or older':'89'})
-gss_clean.age = gss_clean.age.astype('float')
-
-sex_replace_map = {
-    'male':'Male',
-    'female':'Female'
-}
-
-sat_replace_map = {
-    'very dissatisfied':'Very dissatisfied',
-    'a little dissat':'A little dissatisfied',
-    'mod. satisfied':'Moderately satisfied',
-    'very satisfied':'Very satisfied'
-}
-
-agree1_replace_map = {
-    'strongly disagree':'Strongly disagree',
-    'disagree':'Disagree',
-    'agree':'Agree',
-    'strongly agree':'Strongly agree'
-}
-
-agree2_replace_map = {
-    'disagree':'Disagree',
-    'agree':'Agree'
-}
-
-agree3_replace_map = {
-    'strongly disagree':'Strongly disagree',
-    'disagree':'Disagree',
-    'neither agree nor disagree':'Neither agree nor disagree',
-    'agree':'Agree',
-    'strongly agree':'Strongly agree'
-}
-
-gss_clean.sex = gss_clean.sex.map(sex_replace_map)
-gss_clean.satjob = gss_clean.satjob.map(sat_replace_map)
-gss_clean.relationship = gss_clean.relationship.map(agree1_replace_map)
-gss_clean.male_breadwinner = gss_clean.male_breadwinner.map(agree1_replace_map)
-gss_clean.men_bettersuited = gss_clean.men_bettersuited.map(agree2_replace_map)
-gss_clean.child_suffer = gss_clean.child_suffer.map(agree1_replace_map)
-gss_clean.men_overwork = gss_clean.men_overwork.map(agree3_replace_map)
-
-gss_clean['sex'] = gss_clean['sex'].astype('category').cat.reorder_categories([
-    'Male',
-    'Female'
-])
-
-gss_clean['satjob'] = gss_clean['satjob'].astype('category').cat.reorder_categories([
-    'Very dissatisfied',
-    'A little dissatisfied',
-    'Moderately satisfied',
-    'Very satisfied'
-])
-
-gss_clean['relationship'] = gss_clean['relationship'].astype('category').cat.reorder_categories([
-    'Strongly disagree',
-    'Disagree',
-    'Agree',
-    'Strongly agree'
-])
-
-gss_clean['male_breadwinner'] = gss_clean['male_breadwinner'].astype('category').cat.reorder_categories([
-    'Strongly disagree',
-    'Disagree',
-    'Agree',
-    'Strongly agree'
-])
-
-gss_clean['men_bettersuited'] = gss_clean['men_bettersuited'].astype('category').cat.reorder_categories([
-    'Disagree',
-    'Agree'
-])
-
-gss_clean['child_suffer'] = gss_clean['child_suffer'].astype('category').cat.reorder_categories([
-    'Strongly disagree',
-    'Disagree',
-    'Agree',
-    'Strongly agree'
-])
-
-gss_clean['men_overwork'] = gss_clean['men_overwork'].astype('category').cat.reorder_categories([
-    'Strongly disagree',
-    'Disagree',
-    'Neither agree nor disagree',
-    'Agree',
-    'Strongly agree'
-])
-
-gss_clean['region'] = gss_clean['region'].astype('category').cat.reorder_categories([
-    'south atlantic',
-    'e. nor. central',
-    'pacific',
-    'w. sou. central',
-    'middle atlantic',
-    'mountain',
-    'e. sou. central',
-    'w. nor. central',
-    'new england'
-])
-
-gss_clean['edu_cat'] = gss_clean['education'].astype('category')
-
-gss_interactive = gss_clean.copy()
-
-my_groups = [
-    ['sex', 'satjob'],
-    ['sex', 'relationship'],
-    ['sex', 'male_breadwinner'],
-    ['sex', 'men_bettersuited'],
-    ['sex', 'child_suffer'],
-    ['sex', 'men_overwork'],
-    ['region', 'satjob'],
-    ['region', 'relationship'],
-    ['region', 'male_breadwinner'],
-    ['region', 'men_bettersuited'],
-    ['region', 'child_suffer'],
-    ['region', 'men_overwork'],
-    ['edu_cat', 'satjob'],
-    ['edu_cat', 'relationship'],
-    ['edu_cat', 'male_breadwinner'],
-    ['edu_cat', 'men_bettersuited'],
-    ['edu_cat', 'child_suffer'],
-    ['edu_cat', 'men_overwork']
-]
-
-gss_interactive = gss_interactive.dropna()
+from dash.dependencies import ClientsideFunction, Input, Output, State
 
-interactive_results = [
-    pd.pivot(
-        pd.DataFrame(gss_interactive.groupby(group, as_index = False).size()).unstack().reset_index().rename({0:'level_3'}, axis = 'columns'), 
-            values = 'level_3', 
-            index = 'level_1', 
-            columns = 'level_0'
-            ).reset_index(drop = True)
-    for group in my_groups
-]
+import figures
+import instrumentation
+from figures import age_bands, group_dropdown_cols, make_graph, static_figure_names, weighting_options, xdropdown_cols
+from gss_data import region_categories, sex_replace_map
+from precompiled import precompile, serve_precompiled
 
-interactive_cols = [list(pd.DataFrame(result).columns) for result in interactive_results]
 
 ## Formatting specs and reference...
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 
-my_colors = {
-    'Female':'#fde725',
-    'Male':'#21918c',
-    'south atlantic':'#fde725', 
-    'e. nor. central':'#c2df23',
-    'pacific':'#86d549',
-    'w. sou. central':'#52c569',
-    'middle atlantic':'#2ab07f',
-    'mountain':'#1e9b8a',
-    'e. sou. central':'#25858e',
-    'w. nor. central':'#2d708e',
-    'new england':'#38588c',
-    20.0:'#fde725',
-    19.0:'#e5e419',
-    18.0:'#c8e020',
-    17.0:'#addc30',
-    16.0:'#90d743',
-    15.0:'#75d054',
-    14.0:'#5ec962',
-    13.0:'#48c16e',
-    12.0:'#35b779',
-    11.0:'#28ae80',
-    10.0:'#20a486',
-    9.0:'#1f9a8a',
-    8.0:'#21918c',
-    7.0:'#24868e',
-    6.0:'#287c8e',
-    5.0:'#2c728e',
-    4.0:'#31688e',
-    3.0:'#365d8d',
-    2.0:'#3b528b',
-    1.0:'#404688',
-    0.0:'#443983'
-}
-
-xdropdown_cols = ['satjob', 'relationship', 'male_breadwinner', 'men_bettersuited', 'child_suffer', 'men_overwork']
-group_dropdown_cols = ['sex', 'region', 'edu_cat']
+# GSS_STATIC_EXPORT=1 (set by export_static.py) leaves no server callbacks: every figure, weighted and
+# unweighted, ships with the layout and is switched in the browser, so the page can be served as static files.
+static_mode = os.environ.get('GSS_STATIC_EXPORT') == '1'
+
+# GSS_CLIENTSIDE=1 ships every figure to the browser and swaps them there instead of calling make_graph.
+clientside_mode = static_mode or os.environ.get('GSS_CLIENTSIDE') == '1'
+
+# The figures below the fold start as empty placeholders of their final height, and each is fetched
+# when its section scrolls into view (see assets/custom-script.js). GSS_LAZY_FIGURES=0 ships them all with the layout.
+lazy_mode = not static_mode and os.environ.get('GSS_LAZY_FIGURES', '1') == '1'
+lazy_figure_heights = {'scatter_fig':500, 'box_fig1':500, 'box_fig2':500, 'box_facets':600}
 
 
 ## Dashboard object definitions...
@@ -237,287 +45,259 @@ The GSS, or General Social Survey, is a biyearly survey collected by NORC on beh
 [https://www.norc.org/about/who-we-are.html](https://www.norc.org/about/who-we-are.html)
 '''
 
-gss_table = gss_clean.groupby(['sex']).agg({
-    'income':'mean',
-    'job_prestige':'mean',
-    'socioeconomic_index':'mean',
-    'education':'mean'
-    }).reset_index().rename({
-        'sex':'Sex',
-        'income':'Avg. income ($)',
-        'job_prestige': 'Avg. job prestige<br>rating',
-        'socioeconomic_index':'Avg. socioeconomic<br>index',
-        'education':'Avg. years of<br>education'
-    }, axis = 'columns')
-
-gss_table = round(gss_table, 2)
-
-disp_table = ff.create_table(gss_table)
-disp_table.update_layout({
-    'margin':dict(l=100, r=100, t=0, b=0),
-    'font':dict(size=16),
-    'paper_bgcolor':'rgba(0, 0, 0, 0)',
-    'plot_bgcolor':'white'
-    })
-
-bar_data = pd.crosstab(gss_clean.sex, gss_clean.male_breadwinner).reset_index()
-
-bar_data = pd.melt(bar_data, id_vars=['sex'], value_vars=['Strongly disagree', 'Disagree', 'Agree', 'Strongly agree']).rename({'value':'count'}, axis = 'columns')
-
-bar_fig = px.bar(
-    bar_data, x = 'male_breadwinner', y = 'count', color = 'sex',
-    labels = {'male_breadwinner':'Response', 'count':'Number of respondants', 'sex': 'Respondant sex'},
-    barmode = 'group',
-    text = 'count',
-    opacity = 0.9,
-    color_discrete_map = my_colors
-    )
 
-bar_fig.update_layout({
-    'paper_bgcolor':'rgba(0, 0, 0, 0)',
-    'plot_bgcolor':'rgba(0, 0, 0, 0)',
-    'font_color':'#98999A',
-    'yaxis.gridcolor':'#98999A',
-    'font':dict(size=20),
-    'margin':dict(l=25, r=10, t=0, b=50),
-    'legend':dict(x = 0.83, y = 0.9, bgcolor = 'black')
-})
-
-bar_fig.update_traces(marker = dict(line = dict(width = 0)))
-
-scatter_fig = px.scatter(
-    gss_clean, x = 'job_prestige', y = 'income', color = 'sex',
-    trendline = 'ols',
-    labels = {
-        'job_prestige':'Job prestige rating', 
-        'income':'Income',
-        'sex':'Sex',
-        'education':'Education',
-        'socioeconomic_index':'Socioeconomic index'
-        },
-    hover_data = ['education', 'socioeconomic_index'],
-    opacity = 0.4,
-    height = 500,
-    width = 1000,
-    color_discrete_map = my_colors
+# App building and layout arrangement...
+# Figures are built on first use by the figures registry; the layout is built (and memoized) on the
+# first page load, or at boot with GSS_WARM_FIGURES=1.
+def make_layout(placeholder = False):
+    def figure(name):
+        if placeholder:
+            return None
+        if lazy_mode and name in lazy_figure_heights:
+            return {'layout':{
+                'height':lazy_figure_heights[name],
+                'xaxis':{'visible':False},
+                'yaxis':{'visible':False},
+                'paper_bgcolor':'rgba(0, 0, 0, 0)',
+                'plot_bgcolor':'rgba(0, 0, 0, 0)'
+            }}
+        return figures.get('figure_json', name, None if name == 'scatter_fig' else 'unweighted')
+
+    # Every section carries the section count, so assets/custom-script.js knows when it has seen them all.
+    def lazy_section(name, graph):
+        return html.Div([graph, dcc.Store(id = name + '_visible', data = False)], id = name + '_section',
+                        className = 'lazy-section' if lazy_mode else None, **{'data-sections':len(lazy_figure_heights)})
+
+    # The year range slider only shows for multi-year data, and not in clientside mode (which ships full-range figures only).
+    years = [] if placeholder else figures.get('survey_years')
+
+    return html.Div(
+        [
+            html.H1('The Gender Wage-Gap, as Captured in the Data of the 2018 General Social Survey'),
+            html.H6('Kaz Barker, DS6001 Spring 2024'),
+            html.Br(),
+            html.H3(' - Background - '),
+            dcc.Markdown(children = gender_wage_gap),
+            html.Br(),
+            dcc.Markdown(children = gss_summary),
+            html.Br(),
+            html.Br(),
+            html.H3(' - GSS Statistics - '),
+            dcc.RadioItems(
+                id = 'weighting',
+                options = [
+                    {'label':'Unweighted counts and statistics', 'value':'unweighted'},
+                    {'label':'Survey-weighted (GSS weight) counts and statistics', 'value':'weighted'}
+                ],
+                value = 'unweighted'),
+            dcc.Store(id = 'static_figures', data = {
+                weighting:{name:figures.get('figure_json', name, weighting) for name in static_figure_names}
+                for weighting in weighting_options
+            } if static_mode and not placeholder else None),
+            html.Div([
+                html.H6('Survey years:'),
+                dcc.RangeSlider(
+                    id = 'year_range',
+                    min = years[0] if years else 0,
+                    max = years[-1] if years else 0,
+                    step = None,
+                    marks = {year:str(year) for year in years},
+                    value = [years[0], years[-1]] if years else None)
+            ], style = {} if len(years) > 1 and not clientside_mode else {'display':'none'}),
+            html.H4('Average Metrics by Respondent Sex:'),
+            dcc.Markdown(children = 'Male respondents exhibit higher average annual income than female respondents, despite having similar overall levels of education and job prestige.'),
+            html.Center(dcc.Graph(id = 'disp_table', figure = figure('disp_table'))),
+            html.Br(),
+            html.Br(),
+            html.Br(),
+            html.H4('Responses to the GSS Prompt on the Familial Roles of Men and Women:'),
+            dcc.Markdown(children = 'Rated level of agreement with the GSS prompt: "It is much better for everyone involved if the man is the achiever outside the home and the woman takes care of the home and family". Far fewer male respondents strongly disagree with the statement than female respondents do.'),
+            html.Center(dcc.Graph(id = 'bar_fig', figure = figure('bar_fig'))),
+            html.Br(),
+            html.Br(),
+            html.Br(),
+            html.H4('Interactive plot: GSS Prompt Responses by Respondent Sex, Region of Residence, or Level of Education'),
+            html.Div(className = 'row', children = [
+                html.Div([
+                    dcc.Dropdown(
+                        id = 'grouping',
+                        options = [{'label':i, 'value':i} for i in group_dropdown_cols],
+                        value = 'sex',
+                        clearable = False)
+                ], style = {'padding-left':'80%'}),
+
+                html.Div([
+                    dcc.Graph(id = 'my_graph', responsive = False),
+                    dcc.Store(id = 'interactive_figures', data = {
+                        group + '|' + x + '|' + weighting:make_graph(x, group, weighting)
+                        for group, x in figures.get('interactive_registry') for weighting in weighting_options
+                    } if clientside_mode and not placeholder else None)
+                ], style = {'float':'center'}),
+            
+                html.Div([
+                    dcc.Dropdown(
+                        id = 'x-axis',
+                        options = [{'label':i, 'value':i} for i in xdropdown_cols],
+                        value = 'male_breadwinner',
+                        clearable = False)
+                ], style = {'padding-left':'35%', 'width':'30%', 'padding-top':'2%'}),
+
+                # Filters, answered from the data cube; hidden in clientside mode, which only ships unfiltered figures.
+                html.Div([
+                    html.H6('Filter respondents:'),
+                    dcc.Dropdown(
+                        id = 'sex_filter',
+                        options = [{'label':i, 'value':i} for i in sex_replace_map.values()],
+                        multi = True,
+                        placeholder = 'Any sex'),
+                    dcc.Dropdown(
+                        id = 'region_filter',
+                        options = [{'label':i, 'value':i} for i in region_categories],
+                        multi = True,
+                        placeholder = 'Any region'),
+                    html.Label('Years of education'),
+                    dcc.RangeSlider(
+                        id = 'education_filter',
+                        min = 0,
+                        max = 20,
+                        step = 1,
+                        marks = {i:str(i) for i in range(0, 21, 4)},
+                        value = [0, 20]),
+                    html.Label('Age'),
+                    dcc.RangeSlider(
+                        id = 'age_filter',
+                        min = 0,
+                        max = len(age_bands) - 1,
+                        step = 1,
+                        marks = {i:band for i, band in enumerate(age_bands) if i % 2 == 0},
+                        value = [0, len(age_bands) - 1])
+                ], style = {'padding-left':'20%', 'width':'60%', 'padding-top':'2%'} if not clientside_mode else {'display':'none'})
+            ]),
+
+            html.Br(),
+            html.Br(),
+            html.Br(),
+            html.H4('Income Across Job Prestige Rating:'),
+            dcc.Markdown(children = 'Male income generally grows faster than female income as job prestige rating increases.'),
+            html.Center(lazy_section('scatter_fig', dcc.Graph(id = 'scatter_fig', figure = figure('scatter_fig')))),
+            html.Br(),
+            html.Br(),
+            html.Br(),
+            html.H4('Income and Job Prestige for Male vs Female Respondents:'),
+            dcc.Markdown(children = 'Though average, maximum, and minimum income show little sex-based difference, the middle 50% of reported income values cover a range that is higher for males than for females. At the same time, female respondents on average worked jobs with higher prestige ratings than male respondents.', style = {'width':'90%'}),
+            html.Div([lazy_section('box_fig1', dcc.Graph(id = 'box_fig1', figure = figure('box_fig1'))), html.Br(), html.Br(), html.Br(), html.Br()], style = {'width':'48%', 'float':'left'}),
+            html.Div([lazy_section('box_fig2', dcc.Graph(id = 'box_fig2', figure = figure('box_fig2'))), html.Br(), html.Br(), html.Br(), html.Br()], style = {'width':'48%', 'float':'right'}),
+            html.H4('Income by Level of Job Prestige for Male and Female Respondents:'),
+            dcc.Markdown(children = 'Increases in job prestige are associated with greater increases in income for male respondents than for female respondents.', style = {'width':'90%'}),
+            html.Center(lazy_section('box_facets', dcc.Graph(id = 'box_facets', figure = figure('box_facets'))))
+        ]
     )
 
-scatter_fig.update_layout({
-    'paper_bgcolor':'rgba(0, 0, 0, 0)',
-    'plot_bgcolor':'rgba(0, 0, 0, 0)',
-    'font_color':'#98999A',
-    'yaxis.gridcolor':'#98999A',
-    'xaxis.gridcolor':'#98999A',
-    'font':dict(size=20),
-    'margin':dict(l=25, r=10, t=0, b=50)
-})
-
-scatter_fig.update_traces(marker = dict(size = 10))
-
-box_fig1 = px.box(
-    gss_clean, x = 'sex', y = 'income', color = 'sex',
-    labels = {'income':'Income', 'sex':''},
-    height = 500,
-    width = 500,
-    color_discrete_map = my_colors
-)
-
-box_fig1.update_layout(showlegend = False)
-box_fig1.update_traces(opacity = 0.9)
-box_fig1.update_layout({
-    'paper_bgcolor':'rgba(0, 0, 0, 0)',
-    'plot_bgcolor':'rgba(0, 0, 0, 0)',
-    'font_color':'#98999A',
-    'yaxis.gridcolor':'#98999A',
-    'font':dict(size=20),
-    'margin':dict(l=25, r=10, t=0, b=50)
-})
-
-box_fig2 = px.box(
-    gss_clean, x = 'sex', y = 'job_prestige', color = 'sex',
-    labels = {'job_prestige':'Job prestige rating', 'sex':''},
-    height = 500,
-    width = 500,
-    color_discrete_map = my_colors
-)
-
-box_fig2.update_layout(showlegend = False)
-box_fig2.update_traces(opacity = 0.9)
-box_fig2.update_layout({
-    'paper_bgcolor':'rgba(0, 0, 0, 0)',
-    'plot_bgcolor':'rgba(0, 0, 0, 0)',
-    'font_color':'#98999A',
-    'yaxis.gridcolor':'#98999A',
-    'font':dict(size=20),
-    'margin':dict(l=25, r=10, t=0, b=50)
-})
-
-gss_sub = gss_clean[['income', 'sex', 'job_prestige']].copy()
-
-gss_sub['prestige_category'] = pd.cut(gss_sub.job_prestige, bins = [15, 26, 37, 48, 59, 70, 81], labels = ('Very low', 'Low', 'Lower-average', 'Upper-average', 'High', 'Very high')).astype('category')
-
-gss_sub = gss_sub.dropna()
-
-box_facets = px.box(
-    gss_sub, x = 'income', y = 'sex', color = 'sex',
-    facet_col = 'prestige_category', facet_col_wrap = 2,
-    labels = {'income':'Income', 'sex':''},
-    color_discrete_map = my_colors,
-    category_orders = {
-        'prestige_category':['Very low', 'Low', 'Lower-average', 'Upper-average', 'High', 'Very high'],
-        'sex':['male', 'female']},
-    height = 600,
-    width = 1100
-)
-
-box_facets.update_layout(showlegend = False)
-box_facets.for_each_annotation(lambda a: a.update(text = a.text.replace('prestige_category=', '') + ' prestige'))
-box_facets.update_xaxes(gridcolor = '#98999A')
-box_facets.update_layout({
-    'paper_bgcolor':'rgba(0, 0, 0, 0)',
-    'plot_bgcolor':'rgba(0, 0, 0, 0)',
-    'font_color':'#98999A',
-    'font':dict(size=20)
-})
+@figures.builder
+def layout():
+    return make_layout()
 
+@figures.builder
+def layout_response():
+    from plotly.io.json import to_json_plotly
 
-# App building and layout arrangement...
-app = dash.Dash(__name__, external_stylesheets = external_stylesheets)
-app.layout = html.Div(
-    [
-        html.H1('The Gender Wage-Gap, as Captured in the Data of the 2018 General Social Survey'),
-        html.H6('Kaz Barker, DS6001 Spring 2024'),
-        html.Br(),
-        html.H3(' - Background - '),
-        dcc.Markdown(children = gender_wage_gap),
-        html.Br(),
-        dcc.Markdown(children = gss_summary),
-        html.Br(),
-        html.Br(),
-        html.H3(' - GSS Statistics - '),
-        html.H4('Average Metrics by Respondent Sex:'),
-        dcc.Markdown(children = 'Male respondents exhibit higher average annual income than female respondents, despite having similar overall levels of education and job prestige.'),
-        html.Center(dcc.Graph(figure = disp_table)),
-        html.Br(),
-        html.Br(),
-        html.Br(),
-        html.H4('Responses to the GSS Prompt on the Familial Roles of Men and Women:'),
-        dcc.Markdown(children = 'Rated level of agreement with the GSS prompt: "It is much better for everyone involved if the man is the achiever outside the home and the woman takes care of the home and family". Far fewer male respondents strongly disagree with the statement than female respondents do.'),
-        html.Center(dcc.Graph(figure = bar_fig)),
-        html.Br(),
-        html.Br(),
-        html.Br(),
-        html.H4('Interactive plot: GSS Prompt Responses by Respondent Sex, Region of Residence, or Level of Education'),
-        html.Div(className = 'row', children = [
-            html.Div([
-                dcc.Dropdown(
-                    id = 'grouping',
-                    options = [{'label':i, 'value':i} for i in group_dropdown_cols],
-                    value = 'sex',
-                    clearable = False)
-            ], style = {'padding-left':'80%'}),
+    return precompile(to_json_plotly(app.get_layout()).encode())
 
-            html.Div([
-                dcc.Graph(id = 'my_graph', responsive = False)
-            ], style = {'float':'center'}),
-            
-            html.Div([
-                dcc.Dropdown(
-                    id = 'x-axis',
-                    options = [{'label':i, 'value':i} for i in xdropdown_cols],
-                    value = 'male_breadwinner',
-                    clearable = False)
-            ], style = {'padding-left':'35%', 'width':'30%', 'padding-top':'2%'})
-        ]),
-
-        html.Br(),
-        html.Br(),
-        html.Br(),
-        html.H4('Income Across Job Prestige Rating:'),
-        dcc.Markdown(children = 'Male income generally grows faster than female income as job prestige rating increases.'),
-        html.Center(dcc.Graph(figure = scatter_fig)),
-        html.Br(),
-        html.Br(),
-        html.Br(),
-        html.H4('Income and Job Prestige for Male vs Female Respondents:'),
-        dcc.Markdown(children = 'Though average, maximum, and minimum income show little sex-based difference, the middle 50% of reported income values cover a range that is higher for males than for females. At the same time, female respondents on average worked jobs with higher prestige ratings than male respondents.', style = {'width':'90%'}),
-        html.Div([dcc.Graph(figure = box_fig1), html.Br(), html.Br(), html.Br(), html.Br()], style = {'width':'48%', 'float':'left'}),
-        html.Div([dcc.Graph(figure = box_fig2), html.Br(), html.Br(), html.Br(), html.Br()], style = {'width':'48%', 'float':'right'}),
-        html.H4('Income by Level of Job Prestige for Male and Female Respondents:'),
-        dcc.Markdown(children = 'Increases in job prestige are associated with greater increases in income for male respondents than for female respondents.', style = {'width':'90%'}),
-        html.Center(dcc.Graph(figure = box_facets))
-    ]
-)
+# Static exports load every component bundle up front, since async chunks can't be fetched by fingerprint from static files.
+app = dash.Dash(__name__, external_stylesheets = external_stylesheets, eager_loading = static_mode)
+server = app.server
+app.validation_layout = make_layout(placeholder = True)
+app.layout = lambda: figures.get('layout')
+
+# Serve `_dash-layout` from bytes encoded once (and pre-compressed) instead of re-encoding the
+# layout, with its six embedded figures, on every page load.
+def serve_layout():
+    return(serve_precompiled(figures.get('layout_response'), flask.request))
+
+server.view_functions[app.config.routes_pathname_prefix + '_dash-layout'] = serve_layout
+
+# Prometheus-style metrics for this worker: time and memory per pipeline stage and make_graph call.
+if instrumentation.enabled:
+    @server.route('/metrics')
+    def metrics():
+        cache = figures.figure_cache.stats()
+        return(flask.Response(instrumentation.render_metrics([
+            ('gss_figure_cache_hits_total', 'Interactive figure cache hits.', cache['hits']),
+            ('gss_figure_cache_misses_total', 'Interactive figure cache misses.', cache['misses']),
+            ('gss_figure_cache_coalesced_total', 'Interactive figure requests that waited for an identical build in progress.', cache['coalesced']),
+            ('gss_figure_cache_size', 'Interactive figures currently cached.', cache['size'])
+        ]), mimetype = 'text/plain; version=0.0.4'))
+
+if os.environ.get('GSS_WARM_FIGURES') == '1':
+    figures.warm()
+    figures.get('layout_response')
 
 
 # Callback...
-@app.callback(
-    Output(component_id = 'my_graph', component_property = 'figure'),
-    [
-        Input(component_id = 'x-axis', component_property = 'value'),
-        Input(component_id = 'grouping', component_property = 'value')
-    ]
-)
-
-def make_graph(x, group):
-    frame_index = [i for i in range(0, len(interactive_results)) if x in interactive_cols[i] and group in interactive_cols[i]]
-    label_replace_map = {
-            'satjob':'GSS prompt: "On the whole, how satisfied are you with the work you do?"',
-            'relationship':'GSS prompt: "A preschool child is likely to suffer if his or her mother works."',
-            'male_breadwinner':'GSS prompt: "It is much better for everyone involved if the man is the achiever outside the home and the woman takes care of the home and family."',
-            'men_bettersuited':'GSS prompt: "Most men are better suited emotionally for politics than are most women."',
-            'child_suffer':'GSS prompt: "A preschool child is likely to suffer if his or her mother works."',
-            'men_overwork':'GSS prompt: "Family life often suffers because men concentrate too much on their work."',
-            'sex':'Sex',
-            'region':'Region of residence',
-            'edu_cat':'Years of education',
-            'size':'Size'
-        }
-
-    hover_replace_map = {
-            'satjob':'GSS prompt response',
-            'relationship':'GSS prompt response',
-            'male_breadwinner':'GSS prompt response',
-            'men_bettersuited':'GSS prompt response',
-            'child_suffer':'GSS prompt response',
-            'men_overwork':'GSS prompt response',
-            'sex':'Sex',
-            'region':'Region of residence',
-            'edu_cat':'Years of education',
-            'size':'Size'
-        }
-
-    frame_title = [label_replace_map.get(item, item) for item in  [col for col in interactive_cols[frame_index[0]] if col == x]]
-    
-    func_graph = px.bar(
-        interactive_results[frame_index[0]],
-        x = x,
-        y = 'size',
-        title = '<br>'.join(textwrap.wrap(frame_title[0], width = 80)),
-        labels = hover_replace_map,
-        color = group,
-        barmode = 'group',
-        text = 'size',
-        opacity = 0.9,
-        color_discrete_map = my_colors)
-    
-    func_graph.update_layout({
-        'paper_bgcolor':'rgba(0, 0, 0, 0)',
-        'plot_bgcolor':'rgba(0, 0, 0, 0)',
-        'font_color':'#98999A',
-        'yaxis.gridcolor':'#98999A',
-        'font':dict(size=20),
-        'margin':dict(l=10, r=10, t=90, b=0),
-        'xaxis_title':None,
-        'title.y':1,
-        'title_pad':dict(t=40)
-        })
-    
-    func_graph.update_traces(marker = dict(line = dict(width = 0)))
-
-    return(func_graph)
+interactive_outputs = Output(component_id = 'my_graph', component_property = 'figure')
+interactive_inputs = [
+    Input(component_id = 'x-axis', component_property = 'value'),
+    Input(component_id = 'grouping', component_property = 'value'),
+    Input(component_id = 'weighting', component_property = 'value'),
+    Input(component_id = 'year_range', component_property = 'value'),
+    Input(component_id = 'sex_filter', component_property = 'value'),
+    Input(component_id = 'region_filter', component_property = 'value'),
+    Input(component_id = 'education_filter', component_property = 'value'),
+    Input(component_id = 'age_filter', component_property = 'value')
+]
+
+if clientside_mode:
+    app.clientside_callback(
+        ClientsideFunction(namespace = 'gss', function_name = 'swap_figure'),
+        interactive_outputs,
+        interactive_inputs,
+        State(component_id = 'interactive_figures', component_property = 'data')
+    )
+else:
+    app.callback(interactive_outputs, interactive_inputs)(make_graph)
+
+page_figure_names = static_figure_names + ['scatter_fig']
+
+def update_static_figures(weighting, year_range, *visible):
+    years = figures.year_range(year_range)
+    shown = {name for name, is_visible in zip(lazy_figure_heights, visible) if is_visible or not lazy_mode}
+    triggered = {prop_id.split('.')[0] for prop_id in dash.ctx.triggered_prop_ids}
+
+    if triggered <= {name + '_visible' for name in lazy_figure_heights}:
+        # Sections scrolling into view: send only their figures.
+        wanted = {name for name in shown if name + '_visible' in triggered}
+    else:
+        # Sections not yet seen keep their placeholder, and load the current selection when they are.
+        wanted = {name for name in page_figure_names if name not in lazy_figure_heights or name in shown}
+        # The scatter is unweighted: resend it only for a new year range or when it first scrolls into view.
+        if not triggered & {'year_range', 'scatter_fig_visible'}:
+            wanted.discard('scatter_fig')
+
+    return([
+        figures.range_figure_json(name, None if name == 'scatter_fig' else weighting, years) if name in wanted else dash.no_update
+        for name in page_figure_names
+    ])
+
+if static_mode:
+    app.clientside_callback(
+        ClientsideFunction(namespace = 'gss', function_name = 'swap_static_figures'),
+        [Output(component_id = name, component_property = 'figure') for name in static_figure_names],
+        Input(component_id = 'weighting', component_property = 'value'),
+        State(component_id = 'static_figures', component_property = 'data'),
+        prevent_initial_call = True
+    )
+else:
+    app.callback(
+        [Output(component_id = name, component_property = 'figure') for name in page_figure_names],
+        Input(component_id = 'weighting', component_property = 'value'),
+        Input(component_id = 'year_range', component_property = 'value'),
+        *[Input(component_id = name + '_visible', component_property = 'data') for name in lazy_figure_heights],
+        prevent_initial_call = True
+    )(update_static_figures)
 
 
 # Running...
 if __name__ == '__main__':
-    app.run_server(debug = True, port = 8080)
+    if figures.reload_interval:
+        figures.start_reloader(figures.reload_interval)
+    app.run(debug = True, port = 8080)
@@ -1 +1,69 @@
 alert('JavaScript script just ran')
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    gss: {
+        // Clientside mode (GSS_CLIENTSIDE=1): pick the prebuilt interactive figure out of the
+        // 'interactive_figures' store instead of asking the server to run make_graph.
+        swap_figure: function(x, group, weighting, yearRange, sexes, regions, education, ages, figures) {
+            var figure = figures && figures[group + '|' + x + '|' + weighting];
+            return figure === undefined ? window.dash_clientside.no_update : figure;
+        },
+
+        // Static export (GSS_STATIC_EXPORT=1): the weighting toggle picks the prebuilt static figures
+        // out of the 'static_figures' store, one list entry per figure output.
+        swap_static_figures: function(weighting, figures) {
+            var chosen = figures && figures[weighting];
+            var names = window.dash_clientside.callback_context.outputs_list.map(function(output) {
+                return output.id;
+            });
+            return names.map(function(name) {
+                return chosen && chosen[name] !== undefined ? chosen[name] : window.dash_clientside.no_update;
+            });
+        }
+    }
+});
+
+// Lazy sections: each element with the 'lazy-section' class holds a below-the-fold graph that
+// starts as a placeholder. When it scrolls near the viewport, its '<graph id>_visible' store is
+// set, and the server callback sends the figure. Sections are added by React after this script
+// runs, so they are picked up with a MutationObserver. Every section wrapper (id '<graph id>_section',
+// lazy or not) carries the number of sections in 'data-sections'; once that many have been handled
+// the observer is disconnected, so Plotly redraws don't keep triggering it. Browsers without
+// IntersectionObserver load every section as soon as it appears.
+(function() {
+    function showSection(section) {
+        window.dash_clientside.set_props(section.id.replace(/_section$/, '_visible'), {data: true});
+    }
+
+    var visibility = 'IntersectionObserver' in window ? new IntersectionObserver(function(entries) {
+        entries.forEach(function(entry) {
+            if (entry.isIntersecting) {
+                visibility.unobserve(entry.target);
+                showSection(entry.target);
+            }
+        });
+    }, {rootMargin: '200px 0px'}) : null;
+
+    var sections = new MutationObserver(observeSections);
+
+    function observeSections() {
+        document.querySelectorAll('[data-sections]:not([data-observed])').forEach(function(section) {
+            section.setAttribute('data-observed', 'true');
+            if (!section.classList.contains('lazy-section')) {
+                return;
+            }
+            if (visibility) {
+                visibility.observe(section);
+            } else {
+                showSection(section);
+            }
+        });
+        var handled = document.querySelectorAll('[data-sections][data-observed]');
+        if (handled.length && handled.length >= Number(handled[0].getAttribute('data-sections'))) {
+            sections.disconnect();
+        }
+    }
+
+    sections.observe(document.documentElement, {childList: true, subtree: true});
+    observeSections();
+})();
@@ -0,0 +1,206 @@
+"""Benchmark the Dash endpoints and compare the results with a stored baseline.
+
+Measures the cold start of `app.py` (import, then the first `_dash-layout` request, in
+a fresh interpreter), the payload size and latency of `_dash-layout` and
+`_dash-dependencies`, and the latency percentiles and throughput of
+`_dash-update-component` for the interactive plot across all 18 (x-axis, grouping)
+combinations. Requests go through the Flask test client, or to a running server
+(e.g. a local gunicorn) with --url. The report is written as JSON; with --baseline
+every metric is compared with the stored report, and the exit status is 1 when
+one is worse by more than --tolerance:
+
+    python bench/endpoints.py --out bench/baseline.json
+    python bench/endpoints.py --baseline bench/baseline.json
+    python bench/endpoints.py --url http://127.0.0.1:8000 --concurrency 8
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Report keys where bigger is better; every other metric regresses by growing.
+HIGHER_IS_BETTER = {'requests_per_s'}
+
+COLD_START = '''
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.server.test_client().get('/_dash-layout')
+assert response.status_code == 200
+print(json.dumps({{'import_s':imported - start, 'first_layout_s':time.perf_counter() - imported}}))
+'''
+
+
+def update_body(x, group, weighting = 'unweighted'):
+    return {
+        'output':'my_graph.figure',
+        'outputs':{'id':'my_graph', 'property':'figure'},
+        'inputs':[
+            {'id':'x-axis', 'property':'value', 'value':x},
+            {'id':'grouping', 'property':'value', 'value':group},
+            {'id':'weighting', 'property':'value', 'value':weighting},
+            {'id':'year_range', 'property':'value', 'value':None},
+            {'id':'sex_filter', 'property':'value', 'value':None},
+            {'id':'region_filter', 'property':'value', 'value':None},
+            {'id':'education_filter', 'property':'value', 'value':None},
+            {'id':'age_filter', 'property':'value', 'value':None}
+        ],
+        'changedPropIds':['x-axis.value'],
+        'state':[]
+    }
+
+
+def test_client_session():
+    import app
+
+    client = app.server.test_client()
+
+    def get(path):
+        response = client.get(path)
+        return response.status_code, len(response.get_data())
+
+    def post(path, body):
+        response = client.post(path, json = body)
+        return response.status_code, len(response.get_data())
+    return get, post
+
+
+def http_session(url):
+    import requests
+
+    session = requests.Session()
+
+    def get(path):
+        response = session.get(url + path, headers = {'Accept-Encoding':'identity'})
+        return response.status_code, len(response.content)
+
+    def post(path, body):
+        response = session.post(url + path, json = body)
+        return response.status_code, len(response.content)
+    return get, post
+
+
+def percentiles(times):
+    times = sorted(times)
+
+    def at(q):
+        return round(times[min(len(times) - 1, int(q * len(times)))] * 1000, 3)
+    return {'p50_ms':at(0.5), 'p95_ms':at(0.95), 'p99_ms':at(0.99), 'mean_ms':round(statistics.mean(times) * 1000, 3)}
+
+
+def timed(call, *args):
+    start = time.perf_counter()
+    status, size = call(*args)
+    if status != 200:
+        raise RuntimeError('HTTP {} from {}'.format(status, args[0]))
+    return time.perf_counter() - start, size
+
+
+def cold_start(runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', COLD_START.format(root = ROOT)],
+                             cwd = ROOT, capture_output = True, text = True, check = True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {key:round(statistics.median(result[key] for result in results), 3) for key in results[0]}
+
+
+def endpoint(get, path, requests):
+    # The first request builds what the endpoint serves; cold_start covers that.
+    timed(get, path)
+    results = [timed(get, path) for _ in range(requests)]
+    return dict(percentiles([elapsed for elapsed, _ in results]), bytes = results[-1][1])
+
+
+def update_component(post, requests, concurrency):
+    from figures import group_dropdown_cols, xdropdown_cols
+
+    bodies = [update_body(x, group) for group in group_dropdown_cols for x in xdropdown_cols]
+    for body in bodies:
+        # The first call per combination builds its figure; measure serving, not building.
+        timed(post, '/_dash-update-component', body)
+
+    work = [bodies[i % len(bodies)] for i in range(requests * len(bodies))]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers = concurrency) as pool:
+        results = list(pool.map(lambda body: timed(post, '/_dash-update-component', body), work))
+    wall = time.perf_counter() - start
+
+    report = percentiles([elapsed for elapsed, _ in results])
+    report['requests'] = len(work)
+    report['combinations'] = len(bodies)
+    report['requests_per_s'] = round(len(work) / wall, 1)
+    report['mean_bytes'] = round(statistics.mean(size for _, size in results))
+    return report
+
+
+def compare(report, baseline, tolerance, min_delta_ms = 1.0):
+    """Every numeric metric in both reports, with its ratio to the baseline and whether it regressed.
+
+    Latencies (`*_ms`) also have to grow by at least `min_delta_ms` to count, so jitter on
+    sub-millisecond responses is not reported as a regression.
+    """
+    rows = []
+    for section, metrics in baseline.items():
+        if not isinstance(metrics, dict) or not isinstance(report.get(section), dict):
+            continue
+        for key, before in metrics.items():
+            after = report[section].get(key)
+            if not isinstance(before, (int, float)) or not isinstance(after, (int, float)) or not before:
+                continue
+            ratio = after / before
+            worse = ratio < 1 - tolerance if key in HIGHER_IS_BETTER else ratio > 1 + tolerance
+            if key.endswith('_ms'):
+                worse = worse and after - before >= min_delta_ms
+            rows.append({'metric':section + '.' + key, 'baseline':before, 'current':after, 'ratio':round(ratio, 3), 'regressed':worse})
+    return rows
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--url', help = 'base URL of a running server; default is the Flask test client')
+    parser.add_argument('--requests', type = int, default = 20, help = 'requests per endpoint (per combination for callbacks)')
+    parser.add_argument('--concurrency', type = int, default = 1)
+    parser.add_argument('--cold-runs', type = int, default = 3)
+    parser.add_argument('--out', help = 'write the JSON report here as well as printing it')
+    parser.add_argument('--baseline', help = 'JSON report to compare against')
+    parser.add_argument('--tolerance', type = float, default = 0.2, help = 'allowed relative slowdown before a metric counts as regressed')
+    parser.add_argument('--min-delta-ms', type = float, default = 1.0, help = 'smallest latency increase that counts as regressed')
+    args = parser.parse_args(argv)
+
+    get, post = http_session(args.url.rstrip('/')) if args.url else test_client_session()
+    report = {
+        'target':args.url or 'test-client',
+        'concurrency':args.concurrency,
+        'cold_start':cold_start(args.cold_runs),
+        'dash_layout':endpoint(get, '/_dash-layout', args.requests),
+        'dash_dependencies':endpoint(get, '/_dash-dependencies', args.requests),
+        'update_component':update_component(post, args.requests, args.concurrency)
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'] = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        regressed = [row['metric'] for row in report['comparison'] if row['regressed']]
+        report['regressed'] = regressed
+        status = 1 if regressed else 0
+
+    print(json.dumps(report, indent = 2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent = 2)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
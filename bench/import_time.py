@@ -0,0 +1,56 @@
+"""Measure how long `import app` takes and how much memory it leaves resident.
+
+Each run imports the app in a fresh interpreter, then (for trees with the lazy
+figures registry) times the explicit warm-up that builds every figure. Point
+--repo at another checkout, e.g. a `git worktree` of an older commit, to get
+before/after numbers:
+
+    python bench/import_time.py --runs 5
+    python bench/import_time.py --repo /tmp/before --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = '''
+import json, resource, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+import app
+result = {{'import_s':time.perf_counter() - start, 'import_rss_mb':resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}
+result['plotly_express_loaded'] = 'plotly.express' in sys.modules
+if hasattr(app, 'figures'):
+    start = time.perf_counter()
+    app.figures.warm()
+    app.figures.get('layout')
+    result['warm_s'] = time.perf_counter() - start
+    result['warm_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+'''
+
+
+def run_once(repo):
+    out = subprocess.run([sys.executable, '-c', PROBE.format(repo = repo)],
+                         cwd = repo, capture_output = True, text = True, check = True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--repo', default = os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument('--runs', type = int, default = 3)
+    args = parser.parse_args(argv)
+
+    runs = [run_once(os.path.abspath(args.repo)) for _ in range(args.runs)]
+    report = {'repo':os.path.abspath(args.repo), 'runs':args.runs}
+    for key in runs[0]:
+        values = [run[key] for run in runs]
+        report[key] = values[0] if isinstance(values[0], bool) else round(statistics.median(values), 3)
+    print(json.dumps(report, indent = 2))
+
+
+if __name__ == '__main__':
+    main()
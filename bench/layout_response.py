@@ -0,0 +1,57 @@
+"""Measure the size and latency of `_dash-layout` responses through the Flask test client.
+
+Compares Dash's own handler, which encodes the layout on every request, with the
+precompiled handler for each content coding and for a revalidation answered with
+304. Figures are built before timing, so only serving is measured:
+
+    python bench/layout_response.py --requests 50
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(call, requests):
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        size = call()
+        times.append(time.perf_counter() - start)
+    return {'bytes':size, 'median_ms':round(statistics.median(times) * 1000, 3), 'max_ms':round(max(times) * 1000, 3)}
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--requests', type = int, default = 20)
+    args = parser.parse_args(argv)
+
+    import app
+
+    app.figures.warm()
+    app.figures.get('layout_response')
+    client = app.server.test_client()
+
+    def dash_layout():
+        with app.server.test_request_context('/_dash-layout'):
+            return len(app.app.serve_layout().get_data())
+
+    def precompiled(encoding, etag = None):
+        headers = {'Accept-Encoding':encoding}
+        if etag:
+            headers['If-None-Match'] = etag
+        return lambda: len(client.get('/_dash-layout', headers = headers).get_data())
+
+    report = {'dash_serve_layout':timed(dash_layout, args.requests)}
+    for coding, (etag, _) in app.figures.get('layout_response').items():
+        report['precompiled_' + coding] = timed(precompiled(coding), args.requests)
+        report['precompiled_' + coding + '_304'] = timed(precompiled(coding, '"{}"'.format(etag)), args.requests)
+    print(json.dumps(report, indent = 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Report the memory held and the peak allocation of each data pipeline stage.
+
+Runs the original pipeline (read every column with inferred dtypes, clean with
+row-wise maps, copy and dropna for the interactive frame, copy for the box plot
+subset) next to the current one (usecols with parse-time categoricals and float32,
+category-level recoding, a row mask and a single-copy subset) on the same source,
+and prints the size each stage keeps plus its tracemalloc peak:
+
+    python bench/memory_report.py --source /path/to/gss2018.csv
+"""
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gss_data
+
+PRESTIGE_BINS = [15, 26, 37, 48, 59, 70, 81]
+PRESTIGE_LABELS = ('Very low', 'Low', 'Lower-average', 'Upper-average', 'High', 'Very high')
+
+
+def size_mb(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes / 2 ** 20
+    return value.memory_usage(deep = True).sum() / 2 ** 20
+
+
+def measure(stages):
+    """Run (name, function) stages in order, each taking the previous results, and measure each one."""
+    results, report = {}, {}
+    for name, run in stages:
+        tracemalloc.start()
+        results[name] = run(results)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        report[name] = {'kept_mb':round(size_mb(results[name]), 3), 'peak_mb':round(peak / 2 ** 20, 3)}
+    return report
+
+
+def original_stages(source):
+    def read(results):
+        return pd.read_csv(source, encoding = 'cp1252', na_values = gss_data.na_values)
+
+    def clean(results):
+        gss_clean = results['read'][gss_data.mycols].rename(gss_data.rename_map, axis = 1)
+        gss_clean['age'] = gss_clean['age'].replace({'89 or older':'89'}).astype('float')
+        for col, replace_map in gss_data.category_specs.items():
+            gss_clean[col] = gss_clean[col].map(replace_map).astype('category')
+        gss_clean['region'] = gss_clean['region'].astype('category')
+        gss_clean['edu_cat'] = gss_clean['education'].astype('category')
+        return gss_clean
+
+    def interactive(results):
+        return results['clean'].copy().dropna()
+
+    def box_subset(results):
+        gss_sub = results['clean'][['income', 'sex', 'job_prestige']].copy()
+        gss_sub['prestige_category'] = pd.cut(gss_sub.job_prestige, bins = PRESTIGE_BINS, labels = PRESTIGE_LABELS)
+        return gss_sub.dropna()
+
+    return [('read', read), ('clean', clean), ('interactive', interactive), ('box_subset', box_subset)]
+
+
+def current_stages(source):
+    import figures
+
+    return [
+        ('read', lambda results: gss_data.read_gss(source)),
+        ('clean', lambda results: gss_data.clean_gss(results['read'])),
+        ('interactive', lambda results: results['clean'].notna().all(axis = 1).to_numpy()),
+        ('box_subset', lambda results: figures.make_gss_sub(results['clean']))
+    ]
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--source', default = gss_data.GSS_SOURCE, help = 'URL or path of the raw GSS csv')
+    args = parser.parse_args(argv)
+
+    original = measure(original_stages(args.source))
+    current = measure(current_stages(args.source))
+    report = {
+        name:{
+            'original':original[name],
+            'current':current[name],
+            'kept_reduction':round(1 - current[name]['kept_mb'] / original[name]['kept_mb'], 3)
+        }
+        for name in original
+    }
+    print(json.dumps(report, indent = 2))
+
+
+if __name__ == '__main__':
+    main()
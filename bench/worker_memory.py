@@ -0,0 +1,120 @@
+"""Report per-worker memory of the gunicorn deployment for several worker counts.
+
+For each worker count this starts `gunicorn app:server -c gunicorn.conf.py`, sends a
+few page loads and callbacks so every worker has served traffic, then reads each
+worker's RSS, PSS and private memory from /proc/<pid>/smaps_rollup (Linux only).
+PSS splits shared pages between the processes sharing them, so it shows what
+copy-on-write sharing saves; RSS counts shared pages in full for every worker.
+
+    python bench/worker_memory.py --workers 1 4 8
+    python bench/worker_memory.py --workers 1 4 8 --no-preload
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UPDATE_BODY = json.dumps({
+    'output':'my_graph.figure',
+    'outputs':{'id':'my_graph', 'property':'figure'},
+    'inputs':[
+        {'id':'x-axis', 'property':'value', 'value':'satjob'},
+        {'id':'grouping', 'property':'value', 'value':'region'},
+        {'id':'weighting', 'property':'value', 'value':'unweighted'},
+        {'id':'year_range', 'property':'value', 'value':None},
+        {'id':'sex_filter', 'property':'value', 'value':None},
+        {'id':'region_filter', 'property':'value', 'value':None},
+        {'id':'education_filter', 'property':'value', 'value':None},
+        {'id':'age_filter', 'property':'value', 'value':None}
+    ],
+    'changedPropIds':['x-axis.value'],
+    'state':[]
+}).encode()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def smaps_rollup(pid):
+    fields = {}
+    with open('/proc/{}/smaps_rollup'.format(pid)) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss_mb':fields.get('Rss', 0),
+        'pss_mb':fields.get('Pss', 0),
+        'private_mb':fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
+
+
+def children(pid):
+    with open('/proc/{0}/task/{0}/children'.format(pid)) as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_until_up(url, proc, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError('gunicorn exited with status {}'.format(proc.returncode))
+        try:
+            urllib.request.urlopen(url, timeout = 5).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError('gunicorn did not answer within {}s'.format(timeout))
+
+
+def measure(n_workers, preload, requests_per_worker, timeout):
+    port = free_port()
+    env = dict(os.environ, PORT = str(port), WEB_CONCURRENCY = str(n_workers), GSS_PRELOAD = '1' if preload else '0')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:server', '--config', 'gunicorn.conf.py', '--access-logfile', '/dev/null'],
+        cwd = ROOT, env = env, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+    try:
+        base = 'http://127.0.0.1:{}'.format(port)
+        wait_until_up(base + '/', proc, timeout)
+        for _ in range(requests_per_worker * n_workers):
+            urllib.request.urlopen(base + '/_dash-layout', timeout = timeout).read()
+            urllib.request.urlopen(urllib.request.Request(
+                base + '/_dash-update-component', data = UPDATE_BODY,
+                headers = {'Content-Type':'application/json'}), timeout = timeout).read()
+
+        workers = [smaps_rollup(pid) for pid in children(proc.pid)]
+        report = {'workers':n_workers, 'preload':preload, 'master':smaps_rollup(proc.pid)}
+        for key in ['rss_mb', 'pss_mb', 'private_mb']:
+            report['worker_median_' + key] = round(statistics.median(w[key] for w in workers), 1)
+        report['total_pss_mb'] = round(report['master']['pss_mb'] + sum(w['pss_mb'] for w in workers), 1)
+        return report
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout = 30)
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--workers', type = int, nargs = '+', default = [1, 4, 8])
+    parser.add_argument('--no-preload', action = 'store_true', help = 'let every worker import and build the app itself')
+    parser.add_argument('--requests', type = int, default = 5, help = 'requests per worker before measuring')
+    parser.add_argument('--timeout', type = float, default = 120)
+    args = parser.parse_args(argv)
+
+    reports = [measure(n, not args.no_preload, args.requests, args.timeout) for n in args.workers]
+    print(json.dumps(reports, indent = 2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Heavy figure builds run on this bounded pool, so however many request threads a worker has,
+# at most GSS_COMPUTE_THREADS of them compute at once and the rest stay free to serve cache hits.
+compute_threads = int(os.environ.get('GSS_COMPUTE_THREADS', 2))
+compute_timeout = float(os.environ['GSS_COMPUTE_TIMEOUT']) if os.environ.get('GSS_COMPUTE_TIMEOUT') else None
+
+executor = ThreadPoolExecutor(max_workers = compute_threads, thread_name_prefix = 'gss-compute')
+
+
+def _reset_after_fork():
+    # Pool threads started in the gunicorn master (e.g. by warm()) do not exist in a forked
+    # worker, but the old executor would still count them as idle; give each worker its own.
+    global executor
+    executor = ThreadPoolExecutor(max_workers = compute_threads, thread_name_prefix = 'gss-compute')
+
+
+os.register_at_fork(after_in_child = _reset_after_fork)
+
+
+def run(func, *args):
+    """Run `func(*args)` on the compute pool and wait for its result (up to GSS_COMPUTE_TIMEOUT seconds).
+
+    `func` should only use the arguments it is given: a pool thread must not wait for
+    a lock the calling thread holds, such as the figures registry lock.
+    """
+    return executor.submit(func, *args).result(timeout = compute_timeout)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+def encode_columns(frame, cols):
+    """Return {col: (codes, categories)} for the categorical columns `cols`, computed once per column."""
+    encoded = {}
+    for col in cols:
+        values = frame[col].astype('category').cat
+        encoded[col] = (values.codes.to_numpy(), values.categories)
+    return encoded
+
+
+def count_matrices(encoded, pairs, weights = None):
+    """Count every (group, response) pair in one np.bincount over stacked combined codes.
+
+    Returns one (n_groups, n_responses) matrix per pair, in the order of `pairs`; with
+    `weights` each row adds its weight instead of 1. Rows where either column is
+    missing (code -1) or the weight is missing are not counted.
+    """
+    shapes = [(len(encoded[group][1]), len(encoded[response][1])) for group, response in pairs]
+    offsets = np.cumsum([0] + [n_groups * n_responses for n_groups, n_responses in shapes])
+
+    combined = []
+    combined_weights = []
+    for (group, response), (n_groups, n_responses), offset in zip(pairs, shapes, offsets):
+        group_codes, response_codes = encoded[group][0], encoded[response][0]
+        valid = (group_codes >= 0) & (response_codes >= 0)
+        if weights is not None:
+            valid &= ~np.isnan(weights)
+            combined_weights.append(weights[valid])
+        combined.append(offset + group_codes[valid].astype(np.intp) * n_responses + response_codes[valid])
+
+    counts = np.bincount(
+        np.concatenate(combined),
+        weights = np.concatenate(combined_weights) if weights is not None else None,
+        minlength = offsets[-1])
+    return [counts[start:stop].reshape(shape) for start, stop, shape in zip(offsets[:-1], offsets[1:], shapes)]
+
+
+def count_cube(encoded, dims, weights = None, rows = None):
+    """Dense array of counts over every combination of the category codes of `dims`.
+
+    Axis i has one entry per category of dims[i]; with `weights` each row adds its
+    weight instead of 1. Rows missing any of the columns (code -1) or their weight,
+    or outside the boolean mask `rows`, are not counted.
+    """
+    shape = tuple(len(encoded[dim][1]) for dim in dims)
+    valid = np.ones(len(encoded[dims[0]][0]), dtype = bool) if rows is None else rows.copy()
+    for dim in dims:
+        valid &= encoded[dim][0] >= 0
+    if weights is not None:
+        valid &= ~np.isnan(weights)
+
+    flat = np.ravel_multi_index([encoded[dim][0][valid].astype(np.intp) for dim in dims], shape)
+    counts = np.bincount(flat, weights = weights[valid] if weights is not None else None, minlength = int(np.prod(shape)))
+    return counts.reshape(shape)
+
+
+def query_cube(cube, dims, group, filters):
+    """(n_group, n_response) counts of a cube whose last axis is the response, for the rows in `filters`.
+
+    `filters` maps a dimension to the category codes to keep; dimensions not in it keep
+    every category. All axes but `group` and the response are summed out; excluded
+    `group` categories come back as zero rows, so codes stay aligned with categories.
+    """
+    for axis, dim in enumerate(dims):
+        if dim in filters and dim != group:
+            cube = cube.take(filters[dim], axis = axis)
+    group_axis = dims.index(group)
+    counts = cube.sum(axis = tuple(axis for axis in range(len(dims) - 1) if axis != group_axis))
+    if group in filters:
+        excluded = np.ones(len(counts), dtype = bool)
+        excluded[list(filters[group])] = False
+        counts[excluded] = 0
+    return counts
+
+
+def tidy_crosstab(counts, group, group_categories, response, response_categories, value_name = 'size'):
+    """Turn a count matrix into the long [group, response, size] frame plotly express expects.
+
+    Empty cells are left out, and rows run group-major in category order, matching
+    `frame.groupby([group, response], observed = True).size()`.
+    """
+    group_idx, response_idx = np.nonzero(counts)
+    return pd.DataFrame({
+        group:pd.Categorical.from_codes(group_idx, group_categories),
+        response:pd.Categorical.from_codes(response_idx, response_categories),
+        value_name:counts[group_idx, response_idx]
+    })
+
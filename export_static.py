@@ -0,0 +1,94 @@
+"""Export the dashboard as static files that any web server or CDN can serve.
+
+Runs the data pipeline once in static mode (GSS_STATIC_EXPORT=1): the layout embeds
+the six static figures in both weightings and all 18 interactive figures in both
+weightings, and every callback is clientside. The page is then requested through
+the Flask test client and written out with everything it loads: the Dash component
+bundles, `assets/`, and the layout and callback definitions as JSON files:
+
+    python export_static.py --out site
+    python export_static.py --out site --prefix /gss/
+
+`--prefix` is the URL path the bundle will be served under.
+"""
+import argparse
+import os
+import re
+import sys
+from urllib.parse import urlsplit
+
+# dash-renderer only accepts `_dash-layout` and `_dash-dependencies` served as application/json.
+# Static servers pick the type from the file extension, so the export writes them as .json files
+# and this script, run before the renderer, redirects its requests there.
+FETCH_JSON = '''<script>
+(function() {
+    var fetch = window.fetch;
+    window.fetch = function(url, options) {
+        if (typeof url !== 'string' || !/_dash-(layout|dependencies)$/.test(url)) {
+            return fetch.apply(this, arguments);
+        }
+        return fetch(url + '.json', options).then(function(response) {
+            return response.text().then(function(body) {
+                return new Response(body, {status: response.status, headers: {'Content-Type': 'application/json'}});
+            });
+        });
+    };
+})();
+</script>'''
+
+
+def local_urls(index_html, prefix):
+    """Paths, relative to the bundle root, of every src or href in the page that is served under `prefix`."""
+    urls = re.findall(r'(?:src|href)="([^"]+)"', index_html)
+    return sorted({urlsplit(url).path[len(prefix):] for url in urls if url.startswith(prefix)})
+
+
+def write_file(out, path, data):
+    target = os.path.join(out, *path.split('/'))
+    os.makedirs(os.path.dirname(target), exist_ok = True)
+    with open(target, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def export(out, prefix = '/'):
+    """Write the static bundle to the directory `out`; returns {path: bytes written}."""
+    os.environ['GSS_STATIC_EXPORT'] = '1'
+    os.environ['DASH_REQUESTS_PATHNAME_PREFIX'] = prefix
+    import app
+
+    if not app.static_mode:
+        raise RuntimeError('app was imported before static mode was set; run the export in a fresh interpreter')
+    client = app.server.test_client()
+
+    def fetch(path):
+        response = client.get('/' + path)
+        if response.status_code != 200:
+            raise RuntimeError('HTTP {} from /{}'.format(response.status_code, path))
+        return response.get_data()
+
+    index_html = fetch('').decode()
+    written = {}
+    for path in local_urls(index_html, prefix):
+        written[path] = write_file(out, path, fetch(path))
+    for endpoint in ['_dash-layout', '_dash-dependencies']:
+        written[endpoint + '.json'] = write_file(out, endpoint + '.json', fetch(endpoint))
+
+    index_html = index_html.replace('<footer>', '<footer>\n' + FETCH_JSON, 1)
+    written['index.html'] = write_file(out, 'index.html', index_html.encode())
+    return written
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument('--out', default = 'static_export', help = 'directory to write the bundle to')
+    parser.add_argument('--prefix', default = '/', help = 'URL path the bundle is served under, starting and ending with /')
+    args = parser.parse_args(argv)
+
+    written = export(args.out, args.prefix)
+    print('wrote {} files to {} ({:.1f} MB)'.format(len(written), args.out, sum(written.values()) / 2 ** 20))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
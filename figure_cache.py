@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+
+
+class _Pending:
+    """A build in progress, which concurrent requests for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class FigureCache:
+    """Thread-safe, size-bounded LRU cache of serialized figure JSON.
+
+    Entries are tagged with the version of the data they were built from; asking
+    for a different version drops every entry, so a new data snapshot never serves
+    figures built from the old one. Concurrent misses on one key are coalesced: the
+    first caller builds, and the others wait for its result.
+    """
+
+    def __init__(self, maxsize = 32, version = None):
+        self.maxsize = maxsize
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build, version = None):
+        """Return the cached JSON for `key`, calling `build()` to produce it on a miss."""
+        with self._lock:
+            if version is not None and version != self.version:
+                self._entries.clear()
+                self.version = version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            built_version = self.version
+            pending = self._pending.get((key, built_version))
+            if pending is not None:
+                self.coalesced += 1
+                building = False
+            else:
+                pending = self._pending[(key, built_version)] = _Pending()
+                self.misses += 1
+                building = True
+
+        if not building:
+            return pending.wait()
+
+        # Build outside the lock so one slow figure does not block hits on other keys.
+        try:
+            pending.value = build()
+        except BaseException as error:
+            pending.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._pending[(key, built_version)]
+                if pending.error is None and self.version == built_version:
+                    self._entries[key] = pending.value
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last = False)
+            pending.done.set()
+        return pending.value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size':len(self._entries),
+                'maxsize':self.maxsize,
+                'hits':self.hits,
+                'misses':self.misses,
+                'coalesced':self.coalesced,
+                'version':self.version
+            }
@@ -0,0 +1,797 @@
+import json
+import os
+import sys
+import textwrap
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import compute
+from aggregates import box_stats, group_sums, stratified_sample
+from crosstabs import count_cube, count_matrices, encode_columns, query_cube, tidy_crosstab
+from figure_cache import FigureCache
+from gss_data import changed_columns, data_signature, data_version, fit_trendlines, load_gss_clean, load_trendlines, read_only_frame
+from instrumentation import stage
+
+# Plotly Express and the figure factory are only imported inside the builders, so importing
+# this module (and app.py) loads no plotting code until a figure is first needed.
+
+
+## Formatting specs and reference...
+my_colors = {
+    'Female':'#fde725',
+    'Male':'#21918c',
+    'south atlantic':'#fde725',
+    'e. nor. central':'#c2df23',
+    'pacific':'#86d549',
+    'w. sou. central':'#52c569',
+    'middle atlantic':'#2ab07f',
+    'mountain':'#1e9b8a',
+    'e. sou. central':'#25858e',
+    'w. nor. central':'#2d708e',
+    'new england':'#38588c',
+    20.0:'#fde725',
+    19.0:'#e5e419',
+    18.0:'#c8e020',
+    17.0:'#addc30',
+    16.0:'#90d743',
+    15.0:'#75d054',
+    14.0:'#5ec962',
+    13.0:'#48c16e',
+    12.0:'#35b779',
+    11.0:'#28ae80',
+    10.0:'#20a486',
+    9.0:'#1f9a8a',
+    8.0:'#21918c',
+    7.0:'#24868e',
+    6.0:'#287c8e',
+    5.0:'#2c728e',
+    4.0:'#31688e',
+    3.0:'#365d8d',
+    2.0:'#3b528b',
+    1.0:'#404688',
+    0.0:'#443983'
+}
+
+my_groups = [
+    ['sex', 'satjob'],
+    ['sex', 'relationship'],
+    ['sex', 'male_breadwinner'],
+    ['sex', 'men_bettersuited'],
+    ['sex', 'child_suffer'],
+    ['sex', 'men_overwork'],
+    ['region', 'satjob'],
+    ['region', 'relationship'],
+    ['region', 'male_breadwinner'],
+    ['region', 'men_bettersuited'],
+    ['region', 'child_suffer'],
+    ['region', 'men_overwork'],
+    ['edu_cat', 'satjob'],
+    ['edu_cat', 'relationship'],
+    ['edu_cat', 'male_breadwinner'],
+    ['edu_cat', 'men_bettersuited'],
+    ['edu_cat', 'child_suffer'],
+    ['edu_cat', 'men_overwork']
+]
+
+xdropdown_cols = ['satjob', 'relationship', 'male_breadwinner', 'men_bettersuited', 'child_suffer', 'men_overwork']
+group_dropdown_cols = ['sex', 'region', 'edu_cat']
+
+label_replace_map = {
+    'satjob':'GSS prompt: "On the whole, how satisfied are you with the work you do?"',
+    'relationship':'GSS prompt: "A preschool child is likely to suffer if his or her mother works."',
+    'male_breadwinner':'GSS prompt: "It is much better for everyone involved if the man is the achiever outside the home and the woman takes care of the home and family."',
+    'men_bettersuited':'GSS prompt: "Most men are better suited emotionally for politics than are most women."',
+    'child_suffer':'GSS prompt: "A preschool child is likely to suffer if his or her mother works."',
+    'men_overwork':'GSS prompt: "Family life often suffers because men concentrate too much on their work."',
+    'sex':'Sex',
+    'region':'Region of residence',
+    'edu_cat':'Years of education',
+    'size':'Size'
+}
+
+hover_replace_map = {
+    'satjob':'GSS prompt response',
+    'relationship':'GSS prompt response',
+    'male_breadwinner':'GSS prompt response',
+    'men_bettersuited':'GSS prompt response',
+    'child_suffer':'GSS prompt response',
+    'men_overwork':'GSS prompt response',
+    'sex':'Sex',
+    'region':'Region of residence',
+    'edu_cat':'Years of education',
+    'size':'Size'
+}
+
+weighting_options = ['unweighted', 'weighted']
+
+table_cols = ['income', 'job_prestige', 'socioeconomic_index', 'education']
+
+# Figures that have an unweighted and a survey-weighted version, swapped by the weighting toggle.
+static_figure_names = ['disp_table', 'bar_fig', 'box_fig1', 'box_fig2', 'box_facets']
+
+# GSS_BOX_STATS=1 draws the unweighted box plots from precomputed statistics too, so the page
+# carries a handful of numbers per box (plus outliers) instead of every respondent's value.
+box_stats_mode = os.environ.get('GSS_BOX_STATS') == '1'
+
+# GSS_RELOAD_INTERVAL (seconds) has each process check for a rebuilt snapshot or year store and reload it.
+reload_interval = float(os.environ['GSS_RELOAD_INTERVAL']) if os.environ.get('GSS_RELOAD_INTERVAL') else None
+
+# GSS_SCATTER_POINTS caps the points drawn in the scatter plot, sampling each sex in proportion to its size.
+# The trendlines are always fitted on every respondent, and come cached with the data snapshot.
+scatter_budget = int(os.environ['GSS_SCATTER_POINTS']) if os.environ.get('GSS_SCATTER_POINTS') else None
+
+
+# Columns of gss_clean each builder reads. On a data reload, results whose columns did not change
+# are carried over; builders missing here (the data itself, anything built on `interactive_mask`,
+# which checks every column for missing values, and the layout) are always rebuilt.
+table_dependencies = {'sex', 'income', 'job_prestige', 'socioeconomic_index', 'education', 'weight'}
+column_dependencies = {
+    'survey_weights':{'weight'},
+    'gss_sub':{'sex', 'income', 'job_prestige'},
+    'trendlines':{'sex', 'income', 'job_prestige'},
+    'partitions':{'year'},
+    'survey_years':{'year'},
+    'disp_table':table_dependencies,
+    'bar_fig':{'sex', 'male_breadwinner', 'weight'},
+    'scatter_fig':{'sex', 'income', 'job_prestige', 'education', 'socioeconomic_index'},
+    'box_fig1':{'sex', 'income', 'weight'},
+    'box_fig2':{'sex', 'job_prestige', 'weight'},
+    'box_facets':{'sex', 'income', 'job_prestige', 'weight'}
+}
+
+
+## Lazy registry...
+builders = {}
+_built = {}
+_lock = threading.Lock()
+_key_locks = {}
+_reload_lock = threading.Lock()
+_local = threading.local()
+
+
+def builder(func):
+    """Register `func` so `get(func.__name__, *args)` builds it on first access."""
+    builders[func.__name__] = func
+    return func
+
+
+def _store():
+    # A reload builds into its own store on its own thread; everyone else keeps reading the live one.
+    store = getattr(_local, 'store', None)
+    return _built if store is None else store
+
+
+def get(name, *args):
+    """Return the memoized result of builder `name` called with `args`, building it if needed."""
+    key = (name,) + args
+    store = _store()
+    if key not in store:
+        # One lock per entry: concurrent requests for an entry wait for a single build, while entries
+        # that don't depend on it build alongside. Builders call get() for their inputs, which cannot
+        # deadlock because no entry depends on itself, directly or through others.
+        with _lock:
+            key_lock = _key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in store:
+                with stage('build', builder = name, args = ','.join(map(str, args))):
+                    store[key] = builders[name](*args)
+    return store[key]
+
+
+def key_columns(key):
+    """Columns the registry entry `key` was built from, or None when it depends on every column."""
+    name = key[1] if key[0] == 'figure_json' else key[0]
+    return column_dependencies.get(name)
+
+
+def reload(force = False):
+    """Load the data again if a new build is available, and swap in a rebuilt registry.
+
+    Entries whose input columns are unchanged are carried over; every other entry that was
+    built before is rebuilt on this thread while requests keep being served from the old
+    registry, which is then replaced in one step. Returns the changed columns (None when
+    every column changed), or an empty set when there was nothing to reload.
+    """
+    global _built
+
+    with _reload_lock:
+        old = _built
+        if not force and ('source_signature',) in old and data_signature() == old[('source_signature',)]:
+            return set()
+
+        new = {}
+        _local.store = new
+        try:
+            get('source_signature')
+            changed = changed_columns(old[('gss_clean',)], get('gss_clean')) if ('gss_clean',) in old else None
+            if changed is not None and not changed:
+                # Same data under a new signature (e.g. an identical rebuild): keep everything.
+                old[('source_signature',)] = new[('source_signature',)]
+                return changed
+            for key, value in old.items():
+                columns = key_columns(key)
+                if changed is not None and columns is not None and not (columns & changed):
+                    new[key] = value
+            for key in old:
+                if key not in new:
+                    get(*key)
+        finally:
+            _local.store = None
+
+        with _lock:
+            _built = new
+        return changed
+
+
+def start_reloader(interval):
+    """Check for new data every `interval` seconds on a daemon thread, reloading when it changes."""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                changed = reload()
+            except Exception as error:
+                # Keep serving the data already loaded; the next check tries again.
+                print('GSS data reload failed: {!r}'.format(error), file = sys.stderr)
+                continue
+            if changed != set():
+                print('Reloaded GSS data (changed columns: {})'.format(
+                    'all' if changed is None else ', '.join(sorted(changed))), file = sys.stderr)
+
+    thread = threading.Thread(target = run, name = 'gss-reloader', daemon = True)
+    thread.start()
+    return thread
+
+
+def warm():
+    """Build every figure up front, e.g. before forking workers or taking traffic."""
+    for weighting in weighting_options:
+        for name in static_figure_names:
+            get('figure_json', name, weighting)
+        for group, x in get('interactive_registry'):
+            make_graph(x, group, weighting)
+    get('figure_json', 'scatter_fig', None)
+    if len(get('survey_years')) > 1:
+        for year in get('survey_years'):
+            get('year_partials', year)
+
+
+## Data...
+@builder
+def source_signature():
+    return data_signature()
+
+
+@builder
+def gss_clean():
+    # Record the build marker before reading, so a build landing mid-load is picked up by the next reload.
+    get('source_signature')
+    gss_clean = load_gss_clean()
+    # Keep each survey year's rows contiguous, so a year range is a single row slice.
+    if 'year' in gss_clean and not gss_clean['year'].is_monotonic_increasing:
+        gss_clean = gss_clean.sort_values('year', kind = 'stable', ignore_index = True)
+    return read_only_frame(gss_clean)
+
+
+@builder
+def gss_version():
+    return data_version(get('gss_clean'))
+
+
+@builder
+def survey_weights():
+    return get('gss_clean')['weight'].to_numpy(dtype = float)
+
+
+def weights_for(weighting, rows = None):
+    """Survey weights for `rows` (a slice, mask or positions into `gss_clean`) when weighted, else None."""
+    if weighting != 'weighted':
+        return None
+    if rows is None:
+        return get('survey_weights')
+    return get('survey_weights')[rows]
+
+
+@builder
+def interactive_mask():
+    """Rows of `gss_clean` with no missing values, which the interactive crosstabs count."""
+    return get('gss_clean').notna().all(axis = 1).to_numpy()
+
+
+def make_gss_sub(frame):
+    prestige_category = pd.cut(frame.job_prestige, bins = [15, 26, 37, 48, 59, 70, 81], labels = ('Very low', 'Low', 'Lower-average', 'Upper-average', 'High', 'Very high')).astype('category')
+
+    # Select the complete rows once, rather than copying the columns and then dropping rows.
+    keep = (frame[['income', 'sex']].notna().all(axis = 1) & prestige_category.notna()).to_numpy()
+    return frame.loc[keep, ['income', 'sex', 'job_prestige']].assign(prestige_category = prestige_category[keep])
+
+
+@builder
+def gss_sub():
+    return make_gss_sub(get('gss_clean'))
+
+
+@builder
+def trendlines():
+    return load_trendlines(get('gss_clean'))
+
+
+## Survey years...
+@builder
+def partitions():
+    """Row bounds (start, stop) of each survey year in `gss_clean`; {None: ...} when the data has no year column."""
+    gss_clean = get('gss_clean')
+    if 'year' not in gss_clean:
+        return {None:(0, len(gss_clean))}
+    years, starts = np.unique(gss_clean['year'].to_numpy(), return_index = True)
+    stops = np.append(starts[1:], len(gss_clean))
+    return {int(year):(int(start), int(stop)) for year, start, stop in zip(years, starts, stops)}
+
+
+@builder
+def survey_years():
+    return sorted(year for year in get('partitions') if year is not None)
+
+
+def year_range(value):
+    """Normalize a [first, last] year selection to a (first, last) tuple, or None when it covers every year."""
+    years = get('survey_years')
+    if value is None or not years or (value[0] <= years[0] and value[-1] >= years[-1]):
+        return None
+    return (int(value[0]), int(value[-1]))
+
+
+def years_in(years):
+    return [year for year in get('survey_years') if years[0] <= year <= years[1]]
+
+
+def year_rows(years):
+    """Slice of `gss_clean` rows holding the survey years in `years` (every row when None)."""
+    if years is None:
+        return slice(None)
+    bounds = [get('partitions')[year] for year in years_in(years)]
+    if not bounds:
+        return slice(0, 0)
+    return slice(bounds[0][0], bounds[-1][1])
+
+
+def frame_for(years):
+    """Rows of `gss_clean` for the survey years in `years`, as one contiguous slice."""
+    return get('gss_clean').iloc[year_rows(years)]
+
+
+def table_sums(frame, weights = None):
+    codes = frame['sex'].cat.codes.to_numpy()
+    n_groups = len(frame['sex'].cat.categories)
+    return {col:group_sums(codes, n_groups, frame[col].to_numpy(dtype = float), weights) for col in table_cols}
+
+
+def bar_counts(frame, weights = None):
+    return count_matrices(encode_columns(frame, ['sex', 'male_breadwinner']), [['sex', 'male_breadwinner']], weights)[0]
+
+
+@builder
+def year_partials(year):
+    """Additive pieces of every count and mean for one survey year, summed to serve any year range.
+
+    Holds, per weighting, the interactive data cube (over `interactive_mask` rows), the
+    bar chart counts and the table sums. Box plot quantiles and trendlines
+    are not additive and are computed on the range's rows.
+    """
+    rows = year_rows((year, year))
+    frame = get('gss_clean').iloc[rows]
+    partials = {}
+    for weighting in weighting_options:
+        weights = weights_for(weighting, rows)
+        partials[weighting] = {
+            'cube':make_cube(frame, weights, get('interactive_mask')[rows]),
+            'bar':bar_counts(frame, weights),
+            'table':table_sums(frame, weights)
+        }
+    return partials
+
+
+def range_partials(weighting, years):
+    """Sum the per-year partials over the survey years in `years`."""
+    parts = [get('year_partials', year)[weighting] for year in years_in(years)]
+    return {
+        'cube':{x:sum(part['cube'][x] for part in parts) for x in xdropdown_cols},
+        'bar':sum(part['bar'] for part in parts),
+        'table':{col:tuple(sum(part['table'][col][i] for part in parts) for i in range(2)) for col in table_cols}
+    }
+
+
+## Interactive plot registry...
+def build_interactive_registry(groups):
+    """Key each (group, x) pair by its wrapped title and hover labels."""
+    registry = {}
+    for group, x in groups:
+        registry[(group, x)] = {
+            'title':'<br>'.join(textwrap.wrap(label_replace_map.get(x, x), width = 80)),
+            'labels':hover_replace_map
+        }
+
+    # Every dropdown combination must resolve, so a missing pair fails at boot instead of in the callback.
+    missing = [(group, x) for group in group_dropdown_cols for x in xdropdown_cols if (group, x) not in registry]
+    if missing:
+        raise ValueError('No interactive crosstab for (group, x) pairs: {}'.format(missing))
+
+    return registry
+
+
+@builder
+def interactive_registry():
+    return build_interactive_registry(my_groups)
+
+
+## Data cube...
+# The interactive plot is answered from dense count arrays over sex x region x years of education
+# x age band x response, one per response column, so any filter is a few array sums.
+cube_dims = ['sex', 'region', 'edu_cat', 'age_band']
+age_band_edges = [18, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 90]
+age_bands = ['{}-{}'.format(low, high - 1) for low, high in zip(age_band_edges[:-1], age_band_edges[1:])]
+
+
+def encode_cube_columns(frame):
+    encoded = encode_columns(frame, cube_dims[:-1] + xdropdown_cols)
+    ages = frame['age'].to_numpy(dtype = float)
+    codes = np.searchsorted(age_band_edges, ages, side = 'right') - 1
+    codes[np.isnan(ages) | (codes < 0) | (codes >= len(age_bands))] = -1
+    encoded['age_band'] = (codes, pd.Index(age_bands))
+    return encoded
+
+
+def make_cube(frame, weights = None, rows = None):
+    """{x: count cube over cube_dims + [x]} for every response column."""
+    encoded = encode_cube_columns(frame)
+    return {x:count_cube(encoded, cube_dims + [x], weights, rows) for x in xdropdown_cols}
+
+
+@builder
+def cube(weighting):
+    with stage('cube', weighting = weighting):
+        return make_cube(get('gss_clean'), weights_for(weighting), get('interactive_mask'))
+
+
+def cube_filters(sexes = None, regions = None, education = None, ages = None):
+    """Normalize the filter controls to a hashable ((dim, codes), ...) tuple, leaving out unfiltered dimensions.
+
+    `sexes` and `regions` are lists of category labels, `education` a [low, high] range of
+    years and `ages` a [low, high] range of age band indices; None or everything means no filter.
+    """
+    gss_clean = get('gss_clean')
+    categories = {
+        'sex':list(gss_clean['sex'].cat.categories),
+        'region':list(gss_clean['region'].cat.categories),
+        'edu_cat':list(gss_clean['edu_cat'].cat.categories),
+        'age_band':age_bands
+    }
+    selected = {
+        'sex':sexes or None,
+        'region':regions or None,
+        'edu_cat':None if education is None else [value for value in categories['edu_cat'] if education[0] <= value <= education[-1]],
+        'age_band':None if ages is None else age_bands[int(ages[0]):int(ages[-1]) + 1]
+    }
+    filters = []
+    for dim in cube_dims:
+        if selected[dim] is not None and len(selected[dim]) < len(categories[dim]):
+            filters.append((dim, tuple(categories[dim].index(value) for value in selected[dim] if value in categories[dim])))
+    return tuple(filters)
+
+
+## Static figures...
+def make_gss_table(sums):
+    table = pd.DataFrame({'sex':get('gss_clean')['sex'].cat.categories})
+    for col in table_cols:
+        totals, weight_sums = sums[col]
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            table[col] = totals / weight_sums
+    return table.rename({
+        'sex':'Sex',
+        'income':'Avg. income ($)',
+        'job_prestige': 'Avg. job prestige<br>rating',
+        'socioeconomic_index':'Avg. socioeconomic<br>index',
+        'education':'Avg. years of<br>education'
+    }, axis = 'columns')
+
+
+@builder
+def disp_table(weighting, years = None):
+    import plotly.figure_factory as ff
+
+    if years is None:
+        sums = table_sums(get('gss_clean'), weights_for(weighting))
+    else:
+        sums = range_partials(weighting, years)['table']
+    disp_table = ff.create_table(round(make_gss_table(sums), 2))
+    disp_table.update_layout({
+        'margin':dict(l=100, r=100, t=0, b=0),
+        'font':dict(size=16),
+        'paper_bgcolor':'rgba(0, 0, 0, 0)',
+        'plot_bgcolor':'white'
+        })
+    return disp_table
+
+
+def make_bar_data(counts, weighted = False):
+    gss_clean = get('gss_clean')
+    if weighted:
+        counts = counts.round(1)
+    bar_data = pd.DataFrame(counts, columns = gss_clean['male_breadwinner'].cat.categories).assign(sex = gss_clean['sex'].cat.categories)
+    return pd.melt(bar_data, id_vars=['sex'], value_vars=['Strongly disagree', 'Disagree', 'Agree', 'Strongly agree'], var_name = 'male_breadwinner').rename({'value':'count'}, axis = 'columns')
+
+
+@builder
+def bar_fig(weighting, years = None):
+    import plotly.express as px
+
+    if years is None:
+        counts = bar_counts(get('gss_clean'), weights_for(weighting))
+    else:
+        counts = range_partials(weighting, years)['bar']
+    bar_fig = px.bar(
+        make_bar_data(counts, weighting == 'weighted'), x = 'male_breadwinner', y = 'count', color = 'sex',
+        labels = {'male_breadwinner':'Response', 'count':'Number of respondants', 'sex': 'Respondant sex'},
+        barmode = 'group',
+        text = 'count',
+        opacity = 0.9,
+        color_discrete_map = my_colors
+        )
+
+    bar_fig.update_layout({
+        'paper_bgcolor':'rgba(0, 0, 0, 0)',
+        'plot_bgcolor':'rgba(0, 0, 0, 0)',
+        'font_color':'#98999A',
+        'yaxis.gridcolor':'#98999A',
+        'font':dict(size=20),
+        'margin':dict(l=25, r=10, t=0, b=50),
+        'legend':dict(x = 0.83, y = 0.9, bgcolor = 'black')
+    })
+
+    bar_fig.update_traces(marker = dict(line = dict(width = 0)))
+    return bar_fig
+
+
+@builder
+def scatter_fig(weighting = None, years = None):
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    gss_clean = frame_for(years)
+    scatter_rows = stratified_sample(gss_clean['sex'].cat.codes.to_numpy(), scatter_budget)
+    scatter_fig = px.scatter(
+        gss_clean.iloc[scatter_rows], x = 'job_prestige', y = 'income', color = 'sex',
+        render_mode = 'webgl',
+        labels = {
+            'job_prestige':'Job prestige rating',
+            'income':'Income',
+            'sex':'Sex',
+            'education':'Education',
+            'socioeconomic_index':'Socioeconomic index'
+            },
+        hover_data = ['education', 'socioeconomic_index'],
+        opacity = 0.4,
+        height = 500,
+        width = 1000,
+        color_discrete_map = my_colors
+        )
+
+    for sex, fit in (get('trendlines') if years is None else fit_trendlines(gss_clean)).items():
+        trend_x = np.unique(gss_clean.loc[(gss_clean.sex == sex) & gss_clean.income.notna(), 'job_prestige'].dropna())
+        scatter_fig.add_trace(go.Scattergl(
+            x = trend_x,
+            y = fit['intercept'] + fit['slope'] * trend_x,
+            mode = 'lines',
+            name = sex,
+            legendgroup = sex,
+            showlegend = False,
+            marker = dict(color = my_colors[sex]),
+            hovertemplate = '<b>OLS trendline</b><br>income = %g * job_prestige + %g<br>R<sup>2</sup>=%f<br><br>Sex=%s<br>Job prestige rating=%%{x}<br>Income=%%{y} <b>(trend)</b><extra></extra>' % (
+                fit['slope'], fit['intercept'], fit['r2'], sex)
+            ))
+
+    scatter_fig.update_layout({
+        'paper_bgcolor':'rgba(0, 0, 0, 0)',
+        'plot_bgcolor':'rgba(0, 0, 0, 0)',
+        'font_color':'#98999A',
+        'yaxis.gridcolor':'#98999A',
+        'xaxis.gridcolor':'#98999A',
+        'font':dict(size=20),
+        'margin':dict(l=25, r=10, t=0, b=50)
+    })
+
+    scatter_fig.update_traces(marker = dict(size = 10))
+    return scatter_fig
+
+
+def make_box_stats_fig(frame, value, group_cols, weights = None, **px_args):
+    """Box plot drawn from precomputed box_stats instead of shipping every row of `frame`.
+
+    px.box lays out a stub frame holding one row per group (its value is the group's
+    index), then each trace's boxes are filled in with that group's statistics.
+    """
+    import plotly.express as px
+
+    groups = pd.MultiIndex.from_product([frame[col].cat.categories for col in group_cols], names = group_cols)
+    codes = np.zeros(len(frame), dtype = np.intp)
+    for col in group_cols:
+        col_codes = frame[col].cat.codes.to_numpy()
+        codes = np.where((codes < 0) | (col_codes < 0), -1, codes * len(frame[col].cat.categories) + col_codes)
+    stats = box_stats(codes, len(groups), frame[value].to_numpy(dtype = float), weights)
+
+    stub = groups.to_frame(index = False)
+    stub[value] = np.arange(len(groups), dtype = float)
+    stub = stub[~np.isnan(stats['median'])]
+    box_fig = px.box(stub, **px_args)
+
+    value_axis = 'y' if px_args.get('y') == value else 'x'
+    for trace in box_fig.data:
+        idx = [int(i) for i in trace[value_axis]]
+        trace.update({
+            value_axis:[stats['outliers'][i].tolist() for i in idx],
+            'q1':stats['q1'][idx],
+            'median':stats['median'][idx],
+            'q3':stats['q3'][idx],
+            'lowerfence':stats['lowerfence'][idx],
+            'upperfence':stats['upperfence'][idx],
+            'boxpoints':'outliers'
+        })
+    return box_fig
+
+
+def make_box_fig(value, label, weighting, years = None):
+    import plotly.express as px
+
+    box_args = dict(
+        x = 'sex', y = value, color = 'sex',
+        labels = {value:label, 'sex':''},
+        height = 500,
+        width = 500,
+        color_discrete_map = my_colors
+    )
+    frame = frame_for(years)
+    weights = weights_for(weighting, None if years is None else year_rows(years))
+    if weights is None and not box_stats_mode:
+        box_fig = px.box(frame, **box_args)
+    else:
+        box_fig = make_box_stats_fig(frame, value, ['sex'], weights, **box_args)
+
+    box_fig.update_layout(showlegend = False)
+    box_fig.update_traces(opacity = 0.9)
+    box_fig.update_layout({
+        'paper_bgcolor':'rgba(0, 0, 0, 0)',
+        'plot_bgcolor':'rgba(0, 0, 0, 0)',
+        'font_color':'#98999A',
+        'yaxis.gridcolor':'#98999A',
+        'font':dict(size=20),
+        'margin':dict(l=25, r=10, t=0, b=50)
+    })
+    return box_fig
+
+
+@builder
+def box_fig1(weighting, years = None):
+    return make_box_fig('income', 'Income', weighting, years)
+
+
+@builder
+def box_fig2(weighting, years = None):
+    return make_box_fig('job_prestige', 'Job prestige rating', weighting, years)
+
+
+@builder
+def box_facets(weighting, years = None):
+    import plotly.express as px
+
+    gss_sub = get('gss_sub') if years is None else make_gss_sub(frame_for(years))
+    weights = weights_for(weighting, gss_sub.index.to_numpy())
+    facet_args = dict(
+        x = 'income', y = 'sex', color = 'sex',
+        facet_col = 'prestige_category', facet_col_wrap = 2,
+        labels = {'income':'Income', 'sex':''},
+        color_discrete_map = my_colors,
+        category_orders = {
+            'prestige_category':['Very low', 'Low', 'Lower-average', 'Upper-average', 'High', 'Very high'],
+            'sex':['male', 'female']},
+        height = 600,
+        width = 1100
+    )
+    if weights is None and not box_stats_mode:
+        box_facets = px.box(gss_sub, **facet_args)
+    else:
+        box_facets = make_box_stats_fig(gss_sub, 'income', ['sex', 'prestige_category'], weights, **facet_args)
+
+    box_facets.update_layout(showlegend = False)
+    box_facets.for_each_annotation(lambda a: a.update(text = a.text.replace('prestige_category=', '') + ' prestige'))
+    box_facets.update_xaxes(gridcolor = '#98999A')
+    box_facets.update_layout({
+        'paper_bgcolor':'rgba(0, 0, 0, 0)',
+        'plot_bgcolor':'rgba(0, 0, 0, 0)',
+        'font_color':'#98999A',
+        'font':dict(size=20)
+    })
+    return box_facets
+
+
+@builder
+def figure_json(name, weighting):
+    """A built figure as plain JSON data, serialized once and reused for every response."""
+    return json.loads(get(name, weighting).to_json())
+
+
+# Figure caches for the callbacks; they are dropped whenever the data version changes. By default the
+# interactive cache holds every (x, group) pair in both weightings, which warm() builds, with room to spare
+# for filtered and year-range figures, so the first-paint figure is never evicted by warming.
+interactive_figure_count = len(xdropdown_cols) * len(group_dropdown_cols) * len(weighting_options)
+figure_cache = FigureCache(maxsize = int(os.environ.get('GSS_FIGURE_CACHE_SIZE', interactive_figure_count + 64)))
+# Static figures for year ranges other than the full one; sized separately with GSS_RANGE_FIGURE_CACHE_SIZE.
+range_figure_cache = FigureCache(maxsize = int(os.environ.get('GSS_RANGE_FIGURE_CACHE_SIZE', 32)))
+
+
+def range_figure_json(name, weighting, years = None):
+    """Figure JSON for a year range; the full range is the memoized figure_json, other ranges go through an LRU cache."""
+    if years is None:
+        return get('figure_json', name, weighting)
+    figure_json = range_figure_cache.get_or_build((name, weighting, years), lambda: builders[name](weighting, years).to_json(), get('gss_version'))
+    return json.loads(figure_json)
+
+
+## Interactive figures...
+def make_graph(x, group, weighting = 'unweighted', years = None, sexes = None, regions = None, education = None, ages = None):
+    years = year_range(years)
+    filters = cube_filters(sexes, regions, education, ages)
+    with stage('make_graph', x = x, group = group, weighting = weighting, years = years, filtered = bool(filters)):
+        figure_json = figure_cache.get_or_build((x, group, weighting, years, filters), lambda: interactive_figure_json(x, group, weighting, years, filters), get('gss_version'))
+        return(json.loads(figure_json))
+
+
+def interactive_figure_json(x, group, weighting = 'unweighted', years = None, filters = ()):
+    """Query the crosstab here, then draw and serialize it on the compute pool."""
+    entry = get('interactive_registry')[(group, x)]
+    frame = cube_crosstab(group, x, weighting, years, filters)
+    return compute.run(lambda: draw_interactive_figure(frame, x, group, entry).to_json())
+
+
+def cube_crosstab(group, x, weighting, years = None, filters = ()):
+    """The (group, x) crosstab for a year range and filters, summed out of the data cube."""
+    cube = get('cube', weighting)[x] if years is None else range_partials(weighting, years)['cube'][x]
+    counts = query_cube(cube, cube_dims + [x], group, dict(filters))
+    if weighting == 'weighted':
+        counts = counts.round(1)
+    gss_clean = get('gss_clean')
+    return tidy_crosstab(counts, group, gss_clean[group].cat.categories, x, gss_clean[x].cat.categories)
+
+
+def draw_interactive_figure(frame, x, group, entry):
+    import plotly.express as px
+
+    func_graph = px.bar(
+        frame,
+        x = x,
+        y = 'size',
+        title = entry['title'],
+        labels = entry['labels'],
+        color = group,
+        barmode = 'group',
+        text = 'size',
+        opacity = 0.9,
+        color_discrete_map = my_colors)
+
+    func_graph.update_layout({
+        'paper_bgcolor':'rgba(0, 0, 0, 0)',
+        'plot_bgcolor':'rgba(0, 0, 0, 0)',
+        'font_color':'#98999A',
+        'yaxis.gridcolor':'#98999A',
+        'font':dict(size=20),
+        'margin':dict(l=10, r=10, t=90, b=0),
+        'xaxis_title':None,
+        'title.y':1,
+        'title_pad':dict(t=40)
+        })
+
+    func_graph.update_traces(marker = dict(line = dict(width = 0)))
+
+    return(func_graph)
@@ -0,0 +1,446 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from aggregates import group_ols
+from instrumentation import stage
+
+
+## Source and snapshot locations...
+GSS_SOURCE = os.environ.get('GSS_SOURCE', 'https://github.com/jkropko/DS-6001/raw/master/localdata/gss2018.csv')
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SNAPSHOT_PATH = os.environ.get('GSS_SNAPSHOT', os.path.join(DATA_DIR, 'gss_clean.feather'))
+
+# Multi-year data lives in a directory of per-year partitions; when it exists it is used instead of the snapshot.
+YEAR_STORE_DIR = os.environ.get('GSS_YEAR_STORE', os.path.join(DATA_DIR, 'gss_years'))
+
+# Bump whenever the cleaning steps below or the snapshot layout change, so older snapshots are rebuilt.
+SNAPSHOT_VERSION = 4
+
+
+## Cleaning specs...
+na_values = ['IAP', 'IAP,DK,NA,uncodeable', 'NOT SURE',
+             'DK', 'IAP, DK, NA, uncodeable', '.a', "CAN'T CHOOSE"]
+
+mycols = ['id', 'wtss', 'sex', 'educ', 'region', 'age', 'coninc',
+          'prestg10', 'mapres10', 'papres10', 'sei10', 'satjob',
+          'fechld', 'fefam', 'fepol', 'fepresch', 'meovrwrk']
+
+rename_map = {
+    'wtss':'weight',
+    'educ':'education',
+    'coninc':'income',
+    'prestg10':'job_prestige',
+    'mapres10':'mother_job_prestige',
+    'papres10':'father_job_prestige',
+    'sei10':'socioeconomic_index',
+    'fechld':'relationship',
+    'fefam':'male_breadwinner',
+    'fehire':'hire_women',
+    'fejobaff':'preference_hire_women',
+    'fepol':'men_bettersuited',
+    'fepresch':'child_suffer',
+    'meovrwrk':'men_overwork'
+}
+
+sex_replace_map = {
+    'male':'Male',
+    'female':'Female'
+}
+
+sat_replace_map = {
+    'very dissatisfied':'Very dissatisfied',
+    'a little dissat':'A little dissatisfied',
+    'mod. satisfied':'Moderately satisfied',
+    'very satisfied':'Very satisfied'
+}
+
+agree1_replace_map = {
+    'strongly disagree':'Strongly disagree',
+    'disagree':'Disagree',
+    'agree':'Agree',
+    'strongly agree':'Strongly agree'
+}
+
+agree2_replace_map = {
+    'disagree':'Disagree',
+    'agree':'Agree'
+}
+
+agree3_replace_map = {
+    'strongly disagree':'Strongly disagree',
+    'disagree':'Disagree',
+    'neither agree nor disagree':'Neither agree nor disagree',
+    'agree':'Agree',
+    'strongly agree':'Strongly agree'
+}
+
+# Column -> replace map; the order of each map is also the category order.
+category_specs = {
+    'sex':sex_replace_map,
+    'satjob':sat_replace_map,
+    'relationship':agree1_replace_map,
+    'male_breadwinner':agree1_replace_map,
+    'men_bettersuited':agree2_replace_map,
+    'child_suffer':agree1_replace_map,
+    'men_overwork':agree3_replace_map
+}
+
+education_categories = [float(years) for years in range(21)]
+
+# Parse-time dtypes. Text columns become categoricals straight away (only their distinct values
+# are stored as strings), and whole-number measures are read as float32, which holds them
+# exactly in half the space. Weights and the one-decimal socioeconomic index stay float64.
+raw_dtypes = {
+    'id':'int32',
+    'year':'int16',
+    'wtss':'float64',
+    'educ':'float32',
+    'coninc':'float32',
+    'prestg10':'float32',
+    'mapres10':'float32',
+    'papres10':'float32',
+    'sei10':'float64',
+    'age':'category',
+    'sex':'category',
+    'region':'category',
+    'satjob':'category',
+    'fechld':'category',
+    'fefam':'category',
+    'fepol':'category',
+    'fepresch':'category',
+    'meovrwrk':'category'
+}
+
+region_categories = [
+    'south atlantic',
+    'e. nor. central',
+    'pacific',
+    'w. sou. central',
+    'middle atlantic',
+    'mountain',
+    'e. sou. central',
+    'w. nor. central',
+    'new england'
+]
+
+
+## Cleaning...
+def read_gss(source = None, **read_args):
+    """Read the raw GSS extract from `source` (a URL or local path).
+
+    Only `mycols` (and `year`, when present) are parsed, with `raw_dtypes`; `read_args`
+    go to pd.read_csv, e.g. `chunksize`.
+    """
+    with stage('read_csv'):
+        return pd.read_csv(source or GSS_SOURCE, encoding = 'cp1252', na_values = na_values,
+                           usecols = lambda col: col in mycols or col == 'year', dtype = raw_dtypes, **read_args)
+
+
+def recode(values, replace_map):
+    """Categorical of `values` mapped through `replace_map`, with the map's values as categories in order.
+
+    Values missing from the map become NaN. The mapping is done once per distinct value
+    and applied to the category codes, never to the rows.
+    """
+    categories = list(replace_map.values())
+    raw = values.astype('category').cat
+    lookup = np.array([categories.index(replace_map[value]) if value in replace_map else -1 for value in raw.categories] + [-1], dtype = np.int8)
+    return pd.Categorical.from_codes(lookup[raw.codes.to_numpy()], categories)
+
+
+def clean_gss(gss):
+    """Return the cleaned `gss_clean` frame used throughout the dashboard.
+
+    Categories are fixed rather than inferred, so frames cleaned from different survey
+    years (or chunks of the cumulative file) share dtypes and category codes. The
+    survey `year` column is kept when the extract has one.
+    """
+    gss_clean = gss[mycols + [col for col in ['year'] if col in gss.columns]].rename(rename_map, axis = 1)
+
+    # Ages are read as categories, so only the distinct values are converted.
+    age = gss_clean['age'].astype('category').cat
+    ages = pd.to_numeric(age.categories.astype(str).str.replace('89 or older', '89')).to_numpy(dtype = np.float32)
+    gss_clean['age'] = np.append(ages, np.float32(np.nan))[age.codes.to_numpy()]
+
+    with stage('category_mapping'):
+        for col, replace_map in category_specs.items():
+            gss_clean[col] = recode(gss_clean[col], replace_map)
+
+        gss_clean['region'] = recode(gss_clean['region'], dict(zip(region_categories, region_categories)))
+
+        gss_clean['edu_cat'] = pd.Categorical(gss_clean['education'], categories = education_categories)
+
+    return gss_clean
+
+
+def fit_trendlines(gss_clean):
+    """OLS fit of income on job prestige for each sex, as {sex: {'slope', 'intercept', 'r2'}}."""
+    sex = gss_clean['sex'].cat
+    with stage('trendlines'):
+        fit = group_ols(sex.codes.to_numpy(), len(sex.categories),
+                        gss_clean['job_prestige'].to_numpy(dtype = float), gss_clean['income'].to_numpy(dtype = float))
+    return {
+        category:{key:float(fit[key][i]) for key in ['slope', 'intercept', 'r2']}
+        for i, category in enumerate(sex.categories)
+    }
+
+
+def load_trendlines(gss_clean):
+    """Trendline coefficients cached in the snapshot sidecar, or fitted now when cleaning from source."""
+    if 'trendlines' in gss_clean.attrs:
+        return gss_clean.attrs['trendlines']
+    return fit_trendlines(gss_clean)
+
+
+## Snapshot...
+def _metadata_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+
+def _data_path(path, sha256):
+    # Each build's Feather file is named after its checksum, e.g. gss_clean.1f2e....feather, so the
+    # sidecar naming it is the only file replaced in place, and one rename switches builds.
+    stem, ext = os.path.splitext(path)
+    return '{}.{}{}'.format(stem, sha256[:16], ext)
+
+
+def _read_metadata(path):
+    with open(_metadata_path(path)) as f:
+        return json.load(f)
+
+
+def _file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_snapshot(gss_clean, path = SNAPSHOT_PATH, source = None):
+    """Write `gss_clean` as a Feather snapshot plus a JSON sidecar with version and checksum.
+
+    The Feather file goes next to `path`, named after its checksum; the sidecar at `path`
+    with a .json extension records which file that is.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+
+    # Write to temporary files and rename, so a worker booting mid-build never sees half a snapshot.
+    tmp_path = path + '.tmp'
+    gss_clean.reset_index(drop = True).to_feather(tmp_path)
+    sha256 = _file_checksum(tmp_path)
+    metadata = {
+        'version':SNAPSHOT_VERSION,
+        'file':os.path.basename(_data_path(path, sha256)),
+        'sha256':sha256,
+        'source':source or GSS_SOURCE,
+        'rows':len(gss_clean),
+        'trendlines':fit_trendlines(gss_clean)
+    }
+    tmp_meta = _metadata_path(path) + '.tmp'
+    with open(tmp_meta, 'w') as f:
+        json.dump(metadata, f, indent = 2)
+
+    try:
+        previous = _read_metadata(path).get('file')
+    except (OSError, ValueError):
+        previous = None
+    os.replace(tmp_path, _data_path(path, sha256))
+    os.replace(tmp_meta, _metadata_path(path))
+
+    # Keep the file the old sidecar named, for a worker that read it just before the switch; drop older builds.
+    stem, ext = os.path.splitext(os.path.basename(path))
+    for name in os.listdir(os.path.dirname(path)):
+        if name.startswith(stem + '.') and name.endswith(ext) and name not in (metadata['file'], previous, os.path.basename(path)):
+            os.remove(os.path.join(os.path.dirname(path), name))
+    return metadata
+
+
+def snapshot_status(path = SNAPSHOT_PATH):
+    """Return (ok, reason) describing whether the snapshot at `path` can be used.
+
+    The recorded source is not checked: a snapshot built from a local copy of the CSV is as
+    good as one built from the default URL, and the version and checksum cover its contents.
+    """
+    if not os.path.exists(_metadata_path(path)):
+        return False, 'missing'
+    metadata = _read_metadata(path)
+    if metadata.get('version') != SNAPSHOT_VERSION:
+        return False, 'stale version {} (expected {})'.format(metadata.get('version'), SNAPSHOT_VERSION)
+    data_path = os.path.join(os.path.dirname(path), metadata['file'])
+    if not os.path.exists(data_path):
+        return False, 'missing {}'.format(metadata['file'])
+    if metadata['sha256'] != _file_checksum(data_path):
+        return False, 'checksum mismatch'
+    return True, 'ok'
+
+
+def read_snapshot(path = SNAPSHOT_PATH):
+    """Load a snapshot written by `write_snapshot`, memory-mapping the file."""
+    from pyarrow import feather
+
+    metadata = _read_metadata(path)
+    with stage('read_snapshot'):
+        gss_clean = feather.read_table(os.path.join(os.path.dirname(path), metadata['file']), memory_map = True).to_pandas()
+    gss_clean.attrs['sha256'] = metadata['sha256']
+    if 'trendlines' in metadata:
+        gss_clean.attrs['trendlines'] = metadata['trendlines']
+    return gss_clean
+
+
+def data_signature(path = SNAPSHOT_PATH):
+    """(path, mtime, size) of the file written last by a data build: the year store manifest, else the snapshot sidecar.
+
+    A changed signature means a new build may be available; None when neither exists.
+    """
+    marker = _manifest_path(YEAR_STORE_DIR)
+    if not os.path.exists(marker):
+        marker = _metadata_path(path)
+    try:
+        stat = os.stat(marker)
+    except OSError:
+        return None
+    return (marker, stat.st_mtime_ns, stat.st_size)
+
+
+def changed_columns(old, new):
+    """Columns whose values differ between two cleaned frames, or None when the rows themselves differ."""
+    if len(old) != len(new) or not old.index.equals(new.index):
+        return None
+    return {col for col in set(old.columns) | set(new.columns)
+            if col not in old or col not in new or not old[col].equals(new[col])}
+
+
+def load_gss_clean(path = SNAPSHOT_PATH, source = None):
+    """Load `gss_clean` from the year store or the snapshot, falling back to fetching and cleaning the source."""
+    if os.path.exists(_manifest_path(YEAR_STORE_DIR)):
+        return load_year_store(YEAR_STORE_DIR)
+    try:
+        ok, reason = snapshot_status(path)
+        if ok:
+            return read_snapshot(path)
+    except (ImportError, OSError, ValueError) as e:
+        reason = repr(e)
+    print('gss_data: snapshot unusable ({}), cleaning from source'.format(reason), file = sys.stderr)
+    return clean_gss(read_gss(source))
+
+
+## Year-partitioned store...
+def _manifest_path(store_dir):
+    return os.path.join(store_dir, 'manifest.json')
+
+
+def build_year_store(source, store_dir = YEAR_STORE_DIR, chunksize = 100000):
+    """Clean the cumulative GSS file and write one Feather partition per survey year.
+
+    The file is read in chunks and only `mycols` plus `year` are parsed, so the hundreds
+    of other columns in the cumulative file are never loaded.
+    """
+    pieces = {}
+    for chunk in read_gss(source, chunksize = chunksize):
+        for year, rows in clean_gss(chunk).groupby('year'):
+            pieces.setdefault(int(year), []).append(rows)
+
+    os.makedirs(store_dir, exist_ok = True)
+    manifest = {'version':SNAPSHOT_VERSION, 'source':source, 'years':{}}
+    for year, rows in sorted(pieces.items()):
+        path = os.path.join(store_dir, '{}.feather'.format(year))
+        pd.concat(rows, ignore_index = True).to_feather(path + '.tmp')
+        os.replace(path + '.tmp', path)
+        manifest['years'][str(year)] = {'sha256':_file_checksum(path), 'rows':sum(len(piece) for piece in rows)}
+
+    with open(_manifest_path(store_dir) + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent = 2)
+    os.replace(_manifest_path(store_dir) + '.tmp', _manifest_path(store_dir))
+    return manifest
+
+
+def load_year_store(store_dir = YEAR_STORE_DIR):
+    """Load every partition of the year store into one frame sorted by year, checking each checksum."""
+    from pyarrow import feather
+
+    with open(_manifest_path(store_dir)) as f:
+        manifest = json.load(f)
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise ValueError('Year store {} is version {} (expected {}); rebuild it with build-years'.format(
+            store_dir, manifest.get('version'), SNAPSHOT_VERSION))
+
+    frames = []
+    for year, entry in sorted(manifest['years'].items(), key = lambda item: int(item[0])):
+        path = os.path.join(store_dir, '{}.feather'.format(year))
+        if _file_checksum(path) != entry['sha256']:
+            raise ValueError('Checksum mismatch for {}; rebuild the year store'.format(path))
+        with stage('read_snapshot', year = year):
+            frames.append(feather.read_table(path, memory_map = True).to_pandas())
+
+    gss_clean = pd.concat(frames, ignore_index = True)
+    gss_clean.attrs['sha256'] = hashlib.sha256(
+        ''.join(entry['sha256'] for _, entry in sorted(manifest['years'].items())).encode()).hexdigest()
+    return gss_clean
+
+
+def read_only_frame(frame):
+    """Rebuild `frame` on one read-only NumPy array per column (category codes for categoricals).
+
+    Nothing can modify the data in place, and after a fork the columns sit in pages that
+    no Python object header shares, so workers keep them shared copy-on-write.
+    """
+    columns = {}
+    for col in frame.columns:
+        values = frame[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy().copy()
+            codes.flags.writeable = False
+            columns[col] = pd.Categorical.from_codes(codes, dtype = values.dtype)
+        else:
+            array = values.to_numpy().copy()
+            array.flags.writeable = False
+            columns[col] = array
+    read_only = pd.DataFrame(columns, index = frame.index, copy = False)
+    read_only.attrs.update(frame.attrs)
+    return read_only
+
+
+def data_version(gss_clean):
+    """Identify the data `gss_clean` was built from, for invalidating anything derived from it."""
+    if 'sha256' in gss_clean.attrs:
+        return gss_clean.attrs['sha256']
+    return hashlib.sha256(pd.util.hash_pandas_object(gss_clean).values.tobytes()).hexdigest()
+
+
+## CLI...
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Build or check the cleaned GSS snapshot.')
+    parser.add_argument('command', choices = ['build', 'check', 'build-years'])
+    parser.add_argument('--source', default = GSS_SOURCE, help = 'URL or path of the raw GSS csv')
+    parser.add_argument('--out', default = None, help = 'snapshot path (or year store directory for build-years)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build-years':
+        store_dir = args.out or YEAR_STORE_DIR
+        manifest = build_year_store(args.source, store_dir)
+        print('wrote {} partitions to {} ({} rows)'.format(
+            len(manifest['years']), store_dir, sum(entry['rows'] for entry in manifest['years'].values())))
+        return 0
+
+    args.out = args.out or SNAPSHOT_PATH
+
+    if args.command == 'build':
+        metadata = write_snapshot(clean_gss(read_gss(args.source)), args.out, args.source)
+        print('wrote {} ({} rows, sha256 {})'.format(os.path.join(os.path.dirname(args.out), metadata['file']), metadata['rows'], metadata['sha256']))
+        return 0
+
+    ok, reason = snapshot_status(args.out)
+    print('{}: {}'.format(args.out, reason))
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# Production settings for `gunicorn app:server -c gunicorn.conf.py` (see the Procfile).
+#
+# The app is preloaded: the master imports app.py and builds the data and every figure once,
+# then forks the workers, which share all of it copy-on-write instead of each building its own.
+import gc
+import os
+
+bind = '0.0.0.0:' + os.environ.get('PORT', '8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# One request per worker by default: with every figure prebuilt, sync workers serve more requests
+# per second than threaded ones (see the README). GSS_WORKER_CLASS=gthread runs GSS_THREADS threads
+# per worker instead, so a slow uncached build ties up one thread rather than the whole worker.
+worker_class = os.environ.get('GSS_WORKER_CLASS', 'sync')
+# gunicorn quietly turns sync workers into gthread ones when threads > 1, so only set it for gthread.
+threads = int(os.environ.get('GSS_THREADS', 4)) if worker_class == 'gthread' else 1
+preload_app = os.environ.get('GSS_PRELOAD', '1') == '1'
+accesslog = '-'
+# Stage metrics, their stderr log lines and the /metrics route stay off unless GSS_METRICS=1.
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker is forked.
+    if not preload_app:
+        return
+    import app
+
+    app.figures.warm()
+    app.figures.get('layout_response')
+
+    # Move everything built so far out of the collector's reach, so GC passes in the workers
+    # do not write to (and so un-share) the master's pages.
+    gc.collect()
+    gc.freeze()
+    server.log.info('Preloaded GSS data and figures for %s workers', workers)
+
+
+def post_fork(server, worker):
+    # Reloader threads do not survive the fork, so each worker starts its own.
+    import app
+
+    if app.figures.reload_interval:
+        app.figures.start_reloader(app.figures.reload_interval)
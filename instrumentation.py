@@ -0,0 +1,120 @@
+import contextlib
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+# Off by default: every stage is then a shared no-op context manager and /metrics is not served.
+# GSS_METRICS=1 records the stages, logs them to stderr and serves the unauthenticated /metrics.
+enabled = os.environ.get('GSS_METRICS') == '1'
+
+# GSS_TRACEMALLOC=1 also records the peak Python allocation of each stage. Tracing slows every
+# allocation down, so it is off by default; the RSS change is always recorded.
+trace_memory = enabled and os.environ.get('GSS_TRACEMALLOC') == '1'
+if trace_memory:
+    tracemalloc.start()
+
+_stats = {}
+_lock = threading.Lock()
+_local = threading.local()
+_disabled = contextlib.nullcontext()
+
+
+def current_rss():
+    """Resident memory of this process in bytes (the peak instead, where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Stage:
+    """Times one run of a named stage and records it, with its labels, on exit."""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        if trace_memory:
+            # tracemalloc has one peak counter: fold the peak so far into the enclosing stage
+            # before resetting it for this one. Peaks are approximate while threads overlap.
+            peaks = _local.__dict__.setdefault('peaks', [])
+            if peaks:
+                peaks[-1] = max(peaks[-1], tracemalloc.get_traced_memory()[1])
+            peaks.append(0)
+            tracemalloc.reset_peak()
+        self.rss = current_rss()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        rss_delta = current_rss() - self.rss
+        peak = None
+        if trace_memory:
+            peaks = _local.peaks
+            peak = max(peaks.pop(), tracemalloc.get_traced_memory()[1])
+            if peaks:
+                peaks[-1] = max(peaks[-1], peak)
+        record(self.name, self.labels, seconds, rss_delta, peak)
+        return False
+
+
+def stage(name, **labels):
+    """Context manager recording wall time and memory of the stage `name`, e.g. `with stage('read_csv'):`."""
+    if not enabled:
+        return _disabled
+    return Stage(name, {key:str(value) for key, value in labels.items()})
+
+
+def record(name, labels, seconds, rss_delta, peak = None):
+    """Add one run of a stage to the totals served at /metrics, and log it as a JSON line on stderr."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        stats = _stats.setdefault(key, {'calls':0, 'seconds':0.0, 'seconds_max':0.0, 'rss_delta_bytes':0, 'peak_bytes':0})
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        stats['seconds_max'] = max(stats['seconds_max'], seconds)
+        stats['rss_delta_bytes'] = rss_delta
+        if peak is not None:
+            stats['peak_bytes'] = max(stats['peak_bytes'], peak)
+
+    line = dict(event = 'stage', stage = name, seconds = round(seconds, 6), rss_delta_mb = round(rss_delta / 2 ** 20, 3), **labels)
+    if peak is not None:
+        line['peak_mb'] = round(peak / 2 ** 20, 3)
+    print(json.dumps(line), file = sys.stderr)
+
+
+def _format_labels(labels):
+    escaped = ['{}="{}"'.format(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in labels]
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_metrics(gauges = ()):
+    """Prometheus text exposition of every recorded stage, followed by `gauges` as (name, help, value) tuples."""
+    with _lock:
+        stats = sorted(_stats.items())
+
+    series = [
+        ('gss_stage_calls_total', 'counter', 'Runs of each pipeline stage.', 'calls'),
+        ('gss_stage_seconds_total', 'counter', 'Wall time spent in each pipeline stage.', 'seconds'),
+        ('gss_stage_seconds_max', 'gauge', 'Longest single run of each pipeline stage.', 'seconds_max'),
+        ('gss_stage_rss_delta_bytes', 'gauge', 'Change in resident memory over the last run of each stage.', 'rss_delta_bytes')
+    ]
+    if trace_memory:
+        series.append(('gss_stage_traced_peak_bytes', 'gauge', 'Peak traced Python allocation during any run of each stage.', 'peak_bytes'))
+
+    lines = []
+    for metric, kind, help_text, field in series:
+        lines += ['# HELP {} {}'.format(metric, help_text), '# TYPE {} {}'.format(metric, kind)]
+        for (name, labels), values in stats:
+            lines.append('{}{} {}'.format(metric, _format_labels((('stage', name),) + labels), values[field]))
+
+    for metric, help_text, value in [('gss_process_resident_bytes', 'Resident memory of this worker.', current_rss())] + list(gauges):
+        lines += ['# HELP {} {}'.format(metric, help_text), '# TYPE {} gauge'.format(metric), '{} {}'.format(metric, value)]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,52 @@
+import gzip
+import hashlib
+
+# Brotli is optional: without it responses are offered as gzip or uncompressed only.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def precompile(body):
+    """Encode the response `body` (bytes) once per content coding, with a strong ETag for each.
+
+    Returns {coding: (etag, bytes)} for 'identity', 'gzip' and, when the brotli package
+    is installed, 'br'. The gzip stream has no timestamp, so equal bodies give equal bytes.
+    """
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    encoded = {
+        'identity':body,
+        'gzip':gzip.compress(body, compresslevel = 9, mtime = 0)
+    }
+    if brotli is not None:
+        encoded['br'] = brotli.compress(body, quality = 11)
+    return {coding:('{}-{}'.format(digest, coding), data) for coding, data in encoded.items()}
+
+
+def choose_coding(compiled, accept_encodings):
+    """Pick the smallest precompiled coding the client accepts, falling back to identity."""
+    accepted = [coding for coding in compiled if coding != 'identity' and accept_encodings[coding]]
+    return min(accepted, key = lambda coding: len(compiled[coding][1]), default = 'identity')
+
+
+def serve_precompiled(compiled, request, mimetype = 'application/json', cache_control = 'no-cache'):
+    """Flask response for precompiled bytes: the client's best coding, or 304 if its cached copy is current.
+
+    'no-cache' lets browsers keep the body but revalidate it on every use, so a reload
+    of the data is still picked up, at the cost of one request answered with an empty 304.
+    """
+    from flask import Response
+
+    coding = choose_coding(compiled, request.accept_encodings)
+    etag, data = compiled[coding]
+    headers = {'Cache-Control':cache_control, 'Vary':'Accept-Encoding'}
+
+    if request.if_none_match.contains(etag):
+        response = Response(status = 304, headers = headers)
+    else:
+        response = Response(data, mimetype = mimetype, headers = headers)
+        if coding != 'identity':
+            response.headers['Content-Encoding'] = coding
+    response.set_etag(etag)
+    return response
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import box_stats, group_ols, group_quantiles, group_sums, stratified_sample
+
+
+def sample(n = 500, n_groups = 3, seed = 0):
+    rng = np.random.default_rng(seed)
+    codes = rng.integers(-1, n_groups, n)
+    values = rng.normal(50000, 20000, n).round()
+    values[rng.random(n) < 0.1] = np.nan
+    weights = rng.integers(1, 4, n).astype(float)
+    return codes, values, weights
+
+
+def test_group_sums_match_pandas():
+    codes, values, weights = sample()
+    totals, weight_sums = group_sums(codes, 3, values, weights)
+
+    frame = pd.DataFrame({'code':codes, 'value':values, 'weight':weights})
+    frame = frame[(frame.code >= 0) & frame.value.notna()]
+    expected = (frame.value * frame.weight).groupby(frame.code).sum()
+    np.testing.assert_allclose(totals, expected.reindex(range(3)).to_numpy())
+    np.testing.assert_allclose(weight_sums, frame.weight.groupby(frame.code).sum().reindex(range(3)).to_numpy())
+
+
+def test_unweighted_quantiles_match_numpy():
+    codes, values, _ = sample()
+    qs = [0, 0.25, 0.5, 0.75, 1]
+    result = group_quantiles(codes, 3, values, qs)
+
+    for code in range(3):
+        group = values[(codes == code) & ~np.isnan(values)]
+        np.testing.assert_allclose(result[code], np.quantile(group, qs))
+
+
+def test_equal_weights_give_unweighted_quantiles():
+    codes, values, _ = sample()
+    qs = [0.25, 0.5, 0.75]
+    np.testing.assert_allclose(
+        group_quantiles(codes, 3, values, qs, np.full(len(values), 2.5)),
+        group_quantiles(codes, 3, values, qs))
+
+
+def test_weighted_quantile_positions():
+    # Sample k sits at position (S_k - w_k) / (S_n - w_n), S being the cumulative weight.
+    # For weights 1, 2, 1 that is 0, 1/3 and 1, so the median is a quarter of the way from 2 to 3.
+    # This is not the quantile of the rows replicated by weight ([1, 2, 2, 3] has median 2).
+    codes = np.zeros(3, dtype = int)
+    result = group_quantiles(codes, 1, [1.0, 2.0, 3.0], [0.5], [1.0, 2.0, 1.0])
+    assert result[0, 0] == pytest.approx(2.25)
+    assert np.quantile([1.0, 2.0, 2.0, 3.0], 0.5) == 2.0
+
+
+def test_quantiles_of_small_and_empty_groups():
+    codes = np.array([0, 2, 2])
+    result = group_quantiles(codes, 3, [7.0, 1.0, 3.0], [0.25, 0.5])
+    np.testing.assert_allclose(result[0], [7.0, 7.0])
+    assert np.isnan(result[1]).all()
+    np.testing.assert_allclose(result[2], [1.5, 2.0])
+
+
+def test_box_stats_follow_the_iqr_rule():
+    codes, values, _ = sample()
+    stats = box_stats(codes, 3, values)
+
+    for code in range(3):
+        group = values[(codes == code) & ~np.isnan(values)]
+        q1, median, q3 = np.quantile(group, [0.25, 0.5, 0.75])
+        inside = group[(group >= q1 - 1.5 * (q3 - q1)) & (group <= q3 + 1.5 * (q3 - q1))]
+        assert (stats['q1'][code], stats['median'][code], stats['q3'][code]) == pytest.approx((q1, median, q3))
+        assert (stats['lowerfence'][code], stats['upperfence'][code]) == (inside.min(), inside.max())
+        np.testing.assert_array_equal(np.sort(stats['outliers'][code]), np.sort(np.setdiff1d(group, inside)))
+
+
+def test_box_stats_skip_rows_without_weight():
+    codes = np.zeros(6, dtype = int)
+    values = [1.0, 2.0, 3.0, 4.0, 5.0, 1000.0]
+    stats = box_stats(codes, 1, values, [1.0, 1.0, 1.0, 1.0, 1.0, 0.0])
+    assert stats['upperfence'][0] == 5.0
+    assert len(stats['outliers'][0]) == 0
+
+
+def test_group_ols_matches_polyfit():
+    codes, x, _ = sample()
+    rng = np.random.default_rng(1)
+    y = 3.0 * x + 1000.0 * codes + rng.normal(0, 5000, len(x))
+    fits = group_ols(codes, 3, x, y)
+
+    for code in range(3):
+        keep = (codes == code) & ~np.isnan(x)
+        slope, intercept = np.polyfit(x[keep], y[keep], 1)
+        assert (fits['slope'][code], fits['intercept'][code]) == pytest.approx((slope, intercept))
+        assert fits['r2'][code] == pytest.approx(np.corrcoef(x[keep], y[keep])[0, 1] ** 2)
+        assert fits['n'][code] == keep.sum()
+
+
+def test_stratified_sample_keeps_group_proportions():
+    codes = np.repeat([-1, 0, 1, 2], [50, 600, 300, 100])
+    rows = stratified_sample(codes, 100)
+
+    assert len(np.unique(rows)) == len(rows) == 100
+    assert (codes[rows] >= 0).all()
+    np.testing.assert_array_equal(np.bincount(codes[rows]), [60, 30, 10])
+    np.testing.assert_array_equal(rows, stratified_sample(codes, 100))
+    np.testing.assert_array_equal(stratified_sample(codes, 5000), np.flatnonzero(codes >= 0))
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from crosstabs import count_cube, count_matrices, encode_columns, query_cube, tidy_crosstab
+
+dims = ['sex', 'region', 'band', 'response']
+
+
+def sample(n = 1000, seed = 0):
+    rng = np.random.default_rng(seed)
+
+    def column(labels):
+        values = pd.Series(rng.choice(labels, n), dtype = pd.CategoricalDtype(labels))
+        values[rng.random(n) < 0.05] = np.nan
+        return values
+
+    weights = rng.uniform(0.5, 3, n)
+    weights[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        'sex':column(['male', 'female']),
+        'region':column(['east', 'west', 'south']),
+        'band':column(['young', 'middle', 'old']),
+        'response':column(['agree', 'neutral', 'disagree', 'refused']),
+        'weight':weights
+    })
+
+
+def pandas_counts(frame, group, response, weighted = False):
+    frame = frame.dropna(subset = [group, response] + (['weight'] if weighted else []))
+    counts = frame.groupby([group, response], observed = False)
+    counts = counts['weight'].sum() if weighted else counts.size()
+    return np.array(counts.unstack(), dtype = float)
+
+
+def test_count_matrices_match_pandas():
+    frame = sample()
+    pairs = [['sex', 'response'], ['region', 'response']]
+    encoded = encode_columns(frame, dims)
+
+    for (group, response), counts in zip(pairs, count_matrices(encoded, pairs)):
+        np.testing.assert_array_equal(counts, pandas_counts(frame, group, response))
+    weights = frame['weight'].to_numpy()
+    for (group, response), counts in zip(pairs, count_matrices(encoded, pairs, weights)):
+        np.testing.assert_allclose(counts, pandas_counts(frame, group, response, weighted = True))
+
+
+def test_tidy_crosstab_matches_groupby():
+    frame = sample()
+    encoded = encode_columns(frame, dims)
+    counts = count_matrices(encoded, [['sex', 'response']])[0]
+    tidy = tidy_crosstab(counts, 'sex', encoded['sex'][1], 'response', encoded['response'][1])
+
+    expected = frame.groupby(['sex', 'response'], observed = True).size()
+    np.testing.assert_array_equal(tidy['size'].to_numpy(), expected.to_numpy())
+    assert list(zip(tidy['sex'], tidy['response'])) == list(expected.index)
+
+
+def test_unfiltered_cube_query_matches_count_matrices():
+    frame = sample()
+    encoded = encode_columns(frame, dims)
+    cube = count_cube(encoded, dims)
+    for group in ['sex', 'region']:
+        # The cube leaves out rows missing any dimension, so compare with the rows complete in all of them.
+        complete = frame.dropna(subset = dims)
+        np.testing.assert_array_equal(query_cube(cube, dims, group, {}), pandas_counts(complete, group, 'response'))
+
+
+def test_filtered_cube_query_matches_pandas():
+    frame = sample()
+    encoded = encode_columns(frame, dims)
+    weights = frame['weight'].to_numpy()
+    cube = count_cube(encoded, dims, weights)
+    filters = {'region':[0, 2], 'band':[1], 'sex':[1]}
+
+    counts = query_cube(cube, dims, 'sex', filters)
+    complete = frame.dropna(subset = dims + ['weight'])
+    kept = complete[complete.region.isin(['east', 'south']) & (complete.band == 'middle')]
+    expected = pandas_counts(kept, 'sex', 'response', weighted = True)
+    # Filtered-out group categories come back as zero rows.
+    expected[0] = 0
+    np.testing.assert_allclose(counts, expected)
+
+
+def test_cube_row_mask():
+    frame = sample()
+    encoded = encode_columns(frame, dims)
+    rows = frame['weight'].to_numpy() > 1
+    cube = count_cube(encoded, dims, rows = rows)
+    complete = frame[rows].dropna(subset = dims)
+    np.testing.assert_array_equal(query_cube(cube, dims, 'region', {}), pandas_counts(complete, 'region', 'response'))
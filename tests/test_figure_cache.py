@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from figure_cache import FigureCache
+
+
+def test_hits_misses_and_eviction():
+    cache = FigureCache(maxsize = 2)
+    for key in ['a', 'b', 'a', 'c']:
+        cache.get_or_build(key, lambda: key.upper())
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 3, 2)
+    # 'b' was the least recently used entry, so 'c' evicted it.
+    assert cache.get_or_build('b', lambda: 'rebuilt') == 'rebuilt'
+
+
+def test_new_version_drops_entries():
+    cache = FigureCache()
+    cache.get_or_build('a', lambda: 'old', version = 1)
+    assert cache.get_or_build('a', lambda: 'new', version = 2) == 'new'
+
+
+def test_concurrent_misses_share_one_build():
+    cache = FigureCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def build():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return 'figure'
+
+    results = []
+    first = threading.Thread(target = lambda: results.append(cache.get_or_build('a', build)))
+    first.start()
+    started.wait()
+    waiters = [threading.Thread(target = lambda: results.append(cache.get_or_build('a', build))) for _ in range(4)]
+    for thread in waiters:
+        thread.start()
+    # Let the waiters reach the pending build before it finishes.
+    while cache.stats()['coalesced'] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [first] + waiters:
+        thread.join()
+
+    assert results == ['figure'] * 5
+    assert len(calls) == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_failed_build_reaches_waiters_and_is_not_cached():
+    cache = FigureCache()
+    started, release = threading.Event(), threading.Event()
+
+    def build():
+        started.set()
+        release.wait()
+        raise ValueError('bad figure')
+
+    errors = []
+
+    def request():
+        try:
+            cache.get_or_build('a', build)
+        except ValueError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target = request)]
+    threads[0].start()
+    started.wait()
+    threads.append(threading.Thread(target = request))
+    threads[1].start()
+    while cache.stats()['coalesced'] < 1:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 2
+    assert cache.get_or_build('a', lambda: 'ok') == 'ok'
+    with pytest.raises(KeyError):
+        cache.get_or_build('b', lambda: {}['missing'])
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import figures
+
+
+def frame(weight_scale = 1.0):
+    return pd.DataFrame({
+        'sex':pd.Categorical(['Female', 'Male', 'Female', 'Male']),
+        'income':[30000.0, 45000.0, np.nan, 52000.0],
+        'job_prestige':[40.0, 55.0, 30.0, 62.0],
+        'weight':np.array([1.0, 2.0, 0.5, 1.5]) * weight_scale,
+        'year':[2016, 2016, 2018, 2018]
+    })
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    data = {'frame':frame(), 'signature':1}
+    monkeypatch.setattr(figures, '_built', {})
+    monkeypatch.setattr(figures, 'load_gss_clean', lambda: data['frame'])
+    monkeypatch.setattr(figures, 'data_signature', lambda: data['signature'])
+    return data
+
+
+def test_reload_carries_over_entries_with_unchanged_columns(registry):
+    gss_sub, weights, partitions = figures.get('gss_sub'), figures.get('survey_weights'), figures.get('partitions')
+
+    registry['frame'], registry['signature'] = frame(weight_scale = 2.0), 2
+    assert figures.reload() == {'weight'}
+
+    assert figures.get('gss_sub') is gss_sub
+    assert figures.get('partitions') is partitions
+    assert figures.get('survey_weights') is not weights
+    np.testing.assert_allclose(figures.get('survey_weights'), weights * 2)
+
+
+def test_reload_skips_an_unchanged_signature_and_keeps_identical_data(registry):
+    gss_sub = figures.get('gss_sub')
+    assert figures.reload() == set()
+
+    registry['signature'] = 2
+    assert figures.reload() == set()
+    assert figures.get('gss_sub') is gss_sub
+
+
+def test_reload_rebuilds_everything_when_rows_change(registry):
+    gss_sub = figures.get('gss_sub')
+
+    registry['frame'], registry['signature'] = frame().iloc[:3], 2
+    assert figures.reload() is None
+    assert figures.get('gss_sub') is not gss_sub
+    assert len(figures.get('survey_weights')) == 3
@@ -0,0 +1,49 @@
+import pandas as pd
+
+import gss_data
+
+rows = [
+    # id, wtss, sex, educ, region, age, coninc, prestg10, mapres10, papres10, sei10, satjob, fechld, fefam, fepol, fepresch, meovrwrk, year
+    [1, 0.9, 'male', 16, 'pacific', '89 or older', 52000, 55, 40, 'IAP', 62.5, 'very satisfied', 'agree', 'disagree', 'agree', 'strongly agree', 'neither agree nor disagree', 2016],
+    [2, 1.2, 'female', 12, 'new england', '34', 'IAP', 38, 'DK', 45, 40.1, 'a little dissat', 'strongly disagree', 'agree', "CAN'T CHOOSE", 'disagree', 'agree', 2016],
+    [3, 2.4, 'female', 'DK', 'south atlantic', 'DK', 18500, 'IAP', 32, 30, '.a', 'IAP', 'strongly agree', 'strongly disagree', 'disagree', 'IAP', 'NOT SURE', 2018],
+    [4, 0.5, 'male', 20, 'pacific', '61', 97000, 70, 51, 60, 88.0, 'mod. satisfied', 'DK', 'strongly agree', 'IAP', 'agree', 'strongly disagree', 2018],
+]
+columns = gss_data.mycols + ['year']
+
+
+def original_clean(gss):
+    # The row-wise cleaning the app started with.
+    gss_clean = gss[gss_data.mycols].rename(gss_data.rename_map, axis = 1)
+    gss_clean['age'] = gss_clean['age'].replace({'89 or older':'89'}).astype('float')
+    for col, replace_map in gss_data.category_specs.items():
+        gss_clean[col] = gss_clean[col].map(replace_map).astype('category')
+    gss_clean['region'] = gss_clean['region'].astype('category')
+    gss_clean['edu_cat'] = gss_clean['education'].astype('category')
+    return gss_clean
+
+
+def plain(frame):
+    return pd.DataFrame({col:frame[col].astype(object) if isinstance(frame[col].dtype, pd.CategoricalDtype) else frame[col].astype(float)
+                         for col in frame.columns})
+
+
+def test_clean_gss_matches_the_original_cleaning(tmp_path):
+    source = tmp_path / 'gss.csv'
+    pd.DataFrame(rows, columns = columns).to_csv(source, index = False, encoding = 'cp1252')
+
+    cleaned = gss_data.clean_gss(gss_data.read_gss(str(source)))
+    expected = original_clean(pd.read_csv(source, encoding = 'cp1252', na_values = gss_data.na_values))
+
+    assert list(cleaned['year']) == [2016, 2016, 2018, 2018]
+    pd.testing.assert_frame_equal(plain(cleaned.drop(columns = 'year')), plain(expected))
+    # Categories come from the specs, not from whichever values the extract happens to contain.
+    assert list(cleaned['satjob'].cat.categories) == list(gss_data.sat_replace_map.values())
+    assert list(cleaned['region'].cat.categories) == gss_data.region_categories
+
+
+def test_recode_maps_categories_and_drops_unknown_values():
+    values = pd.Series(['agree', None, 'disagree', 'maybe', 'agree'])
+    result = gss_data.recode(values, gss_data.agree2_replace_map)
+    assert list(result.categories) == ['Disagree', 'Agree']
+    assert list(result.codes) == [1, -1, 0, -1, 1]
@@ -0,0 +1,47 @@
+import gzip
+
+import flask
+
+from precompiled import brotli, precompile, serve_precompiled
+
+body = b'{"props":{"children":"' + b'gender wage gap ' * 200 + b'"}}'
+
+
+def respond(compiled, headers):
+    app = flask.Flask(__name__)
+    with app.test_request_context(headers = headers):
+        return serve_precompiled(compiled, flask.request)
+
+
+def test_gzip_is_stable_and_decodes():
+    compiled = precompile(body)
+    assert compiled == precompile(body)
+    assert gzip.decompress(compiled['gzip'][1]) == body
+    assert len({etag for etag, _ in compiled.values()}) == len(compiled)
+
+
+def test_serves_the_smallest_accepted_coding():
+    compiled = precompile(body)
+    response = respond(compiled, {'Accept-Encoding':'gzip, br'})
+    coding = 'br' if brotli is not None else 'gzip'
+    assert response.headers['Content-Encoding'] == coding
+    assert response.get_data() == compiled[coding][1]
+    assert response.headers['Vary'] == 'Accept-Encoding'
+
+    response = respond(compiled, {})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == body
+
+
+def test_current_etag_gets_an_empty_304():
+    compiled = precompile(body)
+    etag = compiled['gzip'][0]
+    response = respond(compiled, {'Accept-Encoding':'gzip', 'If-None-Match':'"{}"'.format(etag)})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.get_etag() == (etag, False)
+
+    # A copy cached under another coding (or older data) is sent in full.
+    response = respond(compiled, {'If-None-Match':'"{}"'.format(etag)})
+    assert response.status_code == 200
+    assert response.get_data() == body